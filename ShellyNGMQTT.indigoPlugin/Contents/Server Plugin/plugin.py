@@ -1,8 +1,11 @@
 import indigo
 import logging
 import re
+import threading
+import time
+import zlib
 
-from queue import Queue
+from queue import Empty, Queue
 
 from shelly.devices.Shelly import Shelly
 from shelly.devices.ShellyBLU import ShellyBLU
@@ -23,6 +26,12 @@ from shelly.devices.ShellyPro1PM import ShellyPro1PM
 from shelly.devices.ShellyPro2 import ShellyPro2
 from shelly.devices.ShellyPro2PM import ShellyPro2PM
 from shelly.devices.ShellyPro4PM import ShellyPro4PM
+from shelly import decoding
+from shelly.dispatcher import MessageDispatcher, POLICY_BLOCK, POLICY_LATEST_WINS
+from shelly.metrics import Metrics
+from shelly.publisher import Publisher
+from shelly.warmup import WarmupScheduler
+from shelly.writes import WriteBuffer
 
 shelly_model_classes = {
     'shelly-blu-doorwindow': ShellyBLUDoorWindow,
@@ -44,6 +53,13 @@ shelly_model_classes = {
     'shelly-pro-4-pm': ShellyPro4PM,
 }
 
+# How long the message thread blocks waiting for work before checking if it should stop
+MESSAGE_WAIT_TIMEOUT = 1.0
+# How often (in seconds) the cached enabled state of the MQTT Connector is refreshed
+MQTT_ENABLED_REFRESH_INTERVAL = 30.0
+# How often (in seconds) RPCs are checked for missed deadlines
+RPC_SWEEP_INTERVAL = 1.0
+
 
 class Plugin(indigo.PluginBase):
     def __init__(self, pluginId, pluginDisplayName, pluginVersion, pluginPrefs):
@@ -51,22 +67,41 @@ class Plugin(indigo.PluginBase):
         self.setLogLevel(pluginPrefs.get('log-level', "info"))
 
         self.shellies = {}
+
+        self.device_cache = {}
+        """Mapping from the indigo device id of a started device to its latest device object"""
+
+        self.device_components = {}
+        """Mapping from the indigo device id of a started component to the component"""
         self.triggers = {}
-        self.message_types = []
+        self.message_types: dict[str, int] = {}
+        """Mapping from a message type to the number of started devices using it"""
+
+        self.device_message_types: dict[int, str] = {}
+        """Mapping from a main device id to the message type it registered"""
         self.message_queue = Queue()
+        self.pending_fetches = set()
+        self.pending_fetches_lock = threading.Lock()
         self.mqtt_plugin = indigo.server.getPlugin("com.flyingdiver.indigoplugin.mqtt")
+        self.mqtt_enabled = False
+        self.mqtt_enabled_expires = 0.0
+        self.metrics = Metrics()
+        self.publisher = Publisher(self.get_mqtt_plugin, self.metrics)
+        self.write_buffer = WriteBuffer(self.get_device, self.metrics)
+        self.dispatcher = None
+        self.dispatcher_reconfigure = False
+        self.status_coalesce_window = self.get_status_coalesce_window(pluginPrefs)
+        self.rpc_sweep_due = 0.0
+        self.warmup = WarmupScheduler(self.get_warmup_rate(pluginPrefs), self.metrics)
 
         # {
-        #   <brokerId>: {
-        #       'some/topic': [dev1, dev2, dev3],
-        #       'another/topic': [dev1, dev4, dev5]
-        #   }
-        #   <anotherBroker>: {
-        #       'some/topic': [dev6, dev7],
-        #       'another/unique/topic': [dev7, dev8, dev9]
-        #   }
+        #   (<brokerId>, ('some', 'topic')): [(<messageType>, shelly1, 'online'), (<messageType>, shelly2, 'rpc')],
+        #   (<anotherBroker>, ('another', 'topic')): [(<messageType>, shelly3, 'events')]
         # }
-        self.broker_device_topics = {}
+        self.topic_routes = {}
+
+        self.device_topic_routes: dict[int, list] = {}
+        """Mapping from a main device id to the topic route keys it registered"""
 
         self.discovered_blu_addresses = set()
         """The set of discovered BLU addresses"""
@@ -83,12 +118,17 @@ class Plugin(indigo.PluginBase):
         if not self.mqtt_plugin:
             self.logger.error("MQTT Connector plugin is required!!")
             exit(-1)
+        self.configure_dispatcher()
+        self.publisher.start()
         indigo.server.subscribeToBroadcast("com.flyingdiver.indigoplugin.mqtt",
                                            "com.flyingdiver.indigoplugin.mqtt-message_queued", "message_handler")
         self.logger.info(self.pluginFolderPath)
 
     def shutdown(self):
-        pass
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            self.dispatcher = None
+        self.publisher.stop()
 
     def runConcurrentThread(self):
         """
@@ -99,16 +139,122 @@ class Plugin(indigo.PluginBase):
 
         try:
             while True:
-                if not self.mqtt_plugin.isEnabled():
+                if not self.is_mqtt_enabled():
                     self.logger.error("MQTT Connector plugin not enabled, aborting.")
                     self.sleep(60)
                 else:
-                    self.process_messages()
-                    self.sleep(0.1)
+                    if self.dispatcher_reconfigure:
+                        self.dispatcher_reconfigure = False
+                        self.configure_dispatcher()
+                    timeout = MESSAGE_WAIT_TIMEOUT
+                    warmup_wait = self.warmup.time_until_next()
+                    if warmup_wait is not None:
+                        timeout = min(timeout, warmup_wait)
+                    self.process_messages(timeout=timeout)
+                    self.sweep_rpcs()
+                    self.warm_up_devices()
+                    self.write_buffer.flush()
+                    if self.stopThread:
+                        raise self.StopThread()
 
         except self.StopThread:
             pass
 
+    def stopConcurrentThread(self):
+        """
+        Signal the message thread to stop and wake it if it is waiting for messages.
+
+        :return: None
+        """
+
+        super(Plugin, self).stopConcurrentThread()
+        self.message_queue.put(None)
+
+    def configure_dispatcher(self):
+        """
+        Create the message worker pool with the number of workers and queue
+        settings from the plugin config. An existing pool is only replaced if
+        the settings changed, and finishes its queued messages before the new
+        pool starts so that each device's messages stay in order.
+
+        :return: None
+        """
+
+        try:
+            worker_count = max(1, int(self.pluginPrefs.get('message-workers', 1)))
+        except ValueError:
+            worker_count = 1
+        try:
+            queue_size = max(1, int(self.pluginPrefs.get('message-queue-size', 1000)))
+        except ValueError:
+            queue_size = 1000
+        queue_policy = self.pluginPrefs.get('message-queue-policy', POLICY_LATEST_WINS)
+        if queue_policy not in (POLICY_BLOCK, POLICY_LATEST_WINS):
+            queue_policy = POLICY_LATEST_WINS
+
+        if self.dispatcher is not None:
+            if (self.dispatcher.worker_count, self.dispatcher.queue_size, self.dispatcher.queue_policy) == (worker_count, queue_size, queue_policy):
+                return
+            self.dispatcher.stop()
+
+        self.dispatcher = MessageDispatcher(worker_count, self.metrics, queue_size, queue_policy, after_batch=self.write_buffer.flush)
+        self.dispatcher.start()
+        self.logger.debug("Processing messages with {} worker(s), queue size {} ({})".format(worker_count, queue_size, queue_policy))
+
+    def get_status_coalesce_window(self, prefs):
+        """
+        Read the window, in seconds, within which component status messages are coalesced.
+
+        :param prefs: The plugin prefs to read the setting from.
+        :return: The window in seconds, 0 to disable coalescing.
+        """
+
+        try:
+            return max(0.0, float(prefs.get('status-coalesce-window', 250)) / 1000)
+        except ValueError:
+            return 0.0
+
+    def get_warmup_rate(self, prefs):
+        """
+        Read the maximum number of devices warmed up per second after starting.
+
+        :param prefs: The plugin prefs to read the setting from.
+        :return: The number of devices per second, 0 for no limit.
+        """
+
+        try:
+            return max(0.0, float(prefs.get('warmup-devices-per-second', 5)))
+        except ValueError:
+            return 0.0
+
+    def is_mqtt_enabled(self):
+        """
+        Check if the MQTT Connector plugin is enabled.
+
+        The plugin handle and its enabled state are cached and only refreshed
+        from the server every ``MQTT_ENABLED_REFRESH_INTERVAL`` seconds.
+
+        :return: True if the MQTT Connector is enabled.
+        """
+
+        now = time.monotonic()
+        if now >= self.mqtt_enabled_expires:
+            self.mqtt_plugin = indigo.server.getPlugin("com.flyingdiver.indigoplugin.mqtt")
+            self.mqtt_enabled = self.mqtt_plugin.isEnabled()
+            self.mqtt_enabled_expires = now + MQTT_ENABLED_REFRESH_INTERVAL
+        return self.mqtt_enabled
+
+    def get_mqtt_plugin(self):
+        """
+        Get the cached MQTT Connector plugin handle.
+
+        :return: The MQTT Connector plugin if it is enabled, otherwise None.
+        """
+
+        if self.is_mqtt_enabled():
+            return self.mqtt_plugin
+        return None
+
     #
     # Message processing
     #
@@ -117,48 +263,141 @@ class Plugin(indigo.PluginBase):
         """
         Handler to receive and queue messages coming from the mqtt plugin.
 
+        Notifications are coalesced per broker and message type. A single
+        queued fetch drains every message waiting in the MQTT Connector, so
+        additional notifications that arrive before that fetch has started
+        would only cost an empty round trip.
+
         :param notification: The message object.
         :return: None
         """
 
         if notification['message_type'] in self.message_types:
-            self.message_queue.put(notification)
+            key = (int(notification['brokerID']), notification['message_type'])
+            with self.pending_fetches_lock:
+                if key in self.pending_fetches:
+                    self.metrics.increment("notifications coalesced")
+                    return
+                self.pending_fetches.add(key)
+            self.message_queue.put((time.monotonic(), key))
 
-    def process_messages(self):
+    def register_message_type(self, dev_id, message_type):
+        """
+        Count a device as a user of a message type.
+
+        :param dev_id: The id of the main device.
+        :param message_type: The message type the device processes.
+        :return: None
+        """
+
+        self.unregister_message_type(dev_id)
+        self.device_message_types[dev_id] = message_type
+        self.message_types[message_type] = self.message_types.get(message_type, 0) + 1
+
+    def unregister_message_type(self, dev_id):
+        """
+        Stop counting a device as a user of its message type. The message type
+        is no longer accepted once no device is using it.
+
+        :param dev_id: The id of the main device.
+        :return: None
+        """
+
+        message_type = self.device_message_types.pop(dev_id, None)
+        if message_type is None:
+            return
+
+        remaining = self.message_types.get(message_type, 0) - 1
+        if remaining > 0:
+            self.message_types[message_type] = remaining
+        else:
+            self.message_types.pop(message_type, None)
+
+    def process_messages(self, timeout=None):
         """
         Processes messages in the queue until the queue is empty. This is used to pass
         messages that have come from MQTT into the appropriate devices.
 
+        The call blocks for up to ``timeout`` seconds until the first message
+        arrives, so the message thread is woken as soon as there is work.
+
+        :param timeout: The maximum number of seconds to wait for a message.
         :return: None
         """
 
-        while not self.message_queue.empty():
+        try:
+            item = self.message_queue.get(timeout=timeout)
+        except Empty:
+            return
+
+        while item is not None:
             # At least 1 of the devices care about this message
-            notification = self.message_queue.get()
-            if not notification:
-                return
+            enqueued_at, key = item
+            self.metrics.observe("message queue wait", time.monotonic() - enqueued_at)
+
+            # Release the key before draining so any message queued from now
+            # on triggers another fetch instead of being coalesced into this one
+            with self.pending_fetches_lock:
+                self.pending_fetches.discard(key)
 
             # We have a valid message
             # Find the devices that need to get this message and give it to them
-            broker_id = int(notification['brokerID'])
-            props = {'message_type': notification['message_type']}
+            broker_id, message_type = key
+            props = {'message_type': message_type}
             while True:
                 data = self.mqtt_plugin.executeAction("fetchQueuedMessage", deviceId=broker_id, props=props, waitUntilDone=True)
+                self.metrics.increment("fetchQueuedMessage calls")
                 if data is None:  # Ensure we got data back
                     break
+                self.metrics.increment("messages fetched")
 
-                topic = '/'.join(data['topic_parts'])  # transform the topic into a single string
+                topic_parts = tuple(data['topic_parts'])
                 payload = data['payload']
                 message_type = data['message_type']
-                self.logger.debug("    Processing: \"%s\" on topic \"%s\"", payload, topic)
-                device_topics = self.broker_device_topics.get(broker_id, {})  # get device topics for this broker
-                dev_ids = device_topics.get(topic, list())  # get devices listening on this broker for this topic
-                for dev_id in dev_ids:
-                    shelly = self.shellies.get(dev_id, None)
-                    self.logger.debug(shelly)
-                    if shelly is not None and message_type == shelly.get_message_type():
-                        # Send this message data to the shelly object
-                        shelly.handle_message(topic, payload)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("    Processing: \"%s\" on topic \"%s\"", payload, '/'.join(topic_parts))
+                # get devices listening on this broker for this topic
+                for route_message_type, shelly, topic_kind in self.topic_routes.get((broker_id, topic_parts), ()):
+                    if message_type == route_message_type:
+                        # Send this message data to the worker that handles the shelly
+                        self.dispatcher.dispatch(shelly, topic_kind, payload)
+
+            self.sweep_rpcs()
+            self.warm_up_devices()
+            try:
+                item = self.message_queue.get_nowait()
+            except Empty:
+                return
+
+    def sweep_rpcs(self):
+        """
+        Timer driven check for RPCs that passed their deadline.
+
+        Expiring is handed to the worker that owns the Shelly, so RPC
+        callbacks always run on the same thread as the device's messages.
+
+        :return: None
+        """
+
+        now = time.monotonic()
+        if now < self.rpc_sweep_due:
+            return
+        self.rpc_sweep_due = now + RPC_SWEEP_INTERVAL
+
+        for shelly in list(self.shellies.values()):
+            if isinstance(shelly, Shelly) and shelly.rpc.is_sweep_due(now):
+                self.dispatcher.dispatch(shelly, "rpc-expire", None)
+
+    def warm_up_devices(self):
+        """
+        Fetch the status of started devices, as fast as the warm-up rate allows.
+
+        :return: None
+        """
+
+        for shelly in self.warmup.release_due():
+            # The config is only fetched if the status shows it changed since the last fetch
+            shelly.get_full_status()
 
     #
     # Device management
@@ -175,10 +414,14 @@ class Plugin(indigo.PluginBase):
             self.logger.debug("{} not starting again...".format(device.name))
             return
 
+        self.device_cache[device.id] = device
+
         if device.deviceTypeId in shelly_model_classes:
             model_class = shelly_model_classes[device.deviceTypeId]
             shelly = model_class(device.id)
             self.shellies[device.id] = shelly
+            if isinstance(shelly, Shelly):
+                self.device_components.update(shelly.device_components)
 
             if device.deviceTypeId.startswith("shelly-blu"):
                 # Ensure the BLU device has a MAC address defined
@@ -196,21 +439,18 @@ class Plugin(indigo.PluginBase):
                     self.logger.error("\"{}\" is not properly setup! Check the broker and topic root.".format(device.name))
                     return False
 
-                # ensure that deviceSubscriptions has a dictionary of subscriptions for the broker
-                if shelly.get_broker_id() not in self.broker_device_topics:
-                    self.broker_device_topics[shelly.get_broker_id()] = {}
-
-                # Add the device id to each topic list
-                broker_topics = self.broker_device_topics[shelly.get_broker_id()]
-                for topic in shelly.get_topics():
-                    # See if there is a list of devices already listening to this subscription
-                    if topic not in broker_topics:
-                        # initialize a new list of devices for this subscription
-                        broker_topics[topic] = []
-                    broker_topics[topic].append(shelly.device.id)
+                # Add the shelly to the route of each topic it listens to
+                broker_id = shelly.get_broker_id()
+                message_type = shelly.get_message_type()
+                route_keys = []
+                for topic_parts, topic_kind in shelly.get_topic_routes().items():
+                    route_key = (broker_id, topic_parts)
+                    self.topic_routes.setdefault(route_key, []).append((message_type, shelly, topic_kind))
+                    route_keys.append(route_key)
+                self.device_topic_routes[device.id] = route_keys
 
                 # Store the message type
-                self.message_types.append(shelly.get_message_type())
+                self.register_message_type(device.id, message_type)
         else:
             # This is a component device starting
             # if none of the devices in the device group are in self.shellies yet,
@@ -231,23 +471,46 @@ class Plugin(indigo.PluginBase):
                         self.logger.debug("{} needs it's main device started, starting '{}' manually...".format(device.name, grouped_with_device.name))
                         self.deviceStartComm(grouped_with_device)
 
-        # Refresh the device's state list and properties that may have changed between plugin versions
-        device = indigo.device.changeDeviceTypeId(device, device.deviceTypeId)
-        device.replaceOnServer()
-        props = device.pluginProps
-        device.replacePluginPropsOnServer(props)
-        device.stateListOrDisplayStateIdChanged()
+        # Refresh the device's state list and properties that may have changed between plugin versions,
+        # which is only needed when the plugin version or the device's states changed since the last refresh
+        signature = self.get_device_signature(device)
+        if device.pluginProps.get('device-signature', None) != signature:
+            device = indigo.device.changeDeviceTypeId(device, device.deviceTypeId)
+            device.replaceOnServer()
+            props = device.pluginProps
+            props['device-signature'] = signature
+            device.replacePluginPropsOnServer(props)
+            device.stateListOrDisplayStateIdChanged()
+            self.device_cache[device.id] = device
+
+            # Any states read before the state list changed are stale
+            shadow_owner = self.shellies.get(device.id, None) or self.device_components.get(device.id, None)
+            if shadow_owner is not None:
+                shadow_owner.states.invalidate()
+        else:
+            self.metrics.increment("device refreshes skipped")
 
         # Update the config at the end if it is the main device
         if device.id in self.shellies:
             shelly = self.shellies[device.id]
             if isinstance(shelly, ShellyBLU):
                 return
-            shelly.get_config()
+            # Get the config and status of all components across sub-devices once
+            # the warm-up rate allows, so starting many devices doesn't flood the broker
+            self.warmup.schedule(shelly)
+
+    def get_device_signature(self, device):
+        """
+        Build a stamp of the plugin version and the device's state list, which
+        changes whenever a device needs to be refreshed on the Indigo server.
+
+        :param device: The Indigo device.
+        :return: The signature.
+        """
 
-            # Get the status of all components across sub-devices
-            for component in shelly.components:
-                component.get_status()
+        states = "|".join("{}:{}".format(state['Key'], state['Type']) for state in self.getDeviceStateList(device))
+        states += "|" + str(self.getDeviceDisplayStateId(device))
+        return "{}/{}/{:08x}".format(self.pluginVersion, device.deviceTypeId, zlib.crc32(states.encode("utf-8")))
 
     def deviceStopComm(self, device):
         """
@@ -256,28 +519,75 @@ class Plugin(indigo.PluginBase):
         :return:
         """
 
+        self.device_cache.pop(device.id, None)
+        self.write_buffer.forget(device.id)
+
         if device.id in self.shellies:
             shelly = self.shellies[device.id]
 
             if isinstance(shelly, Shelly):
-                # make sure that the device's broker has subscriptions
-                if shelly.get_broker_id() in self.broker_device_topics:
-                    broker_topics = self.broker_device_topics[shelly.get_broker_id()]
-                    for topic in shelly.get_topics():
-                        if topic in broker_topics and shelly.device.id in broker_topics[topic]:
-                            broker_topics[topic].remove(shelly.device.id)
-
-                    # remove the broker key if there are no more devices using it
-                    if len(broker_topics) == 0:
-                        del self.broker_device_topics[shelly.get_broker_id()]
-
-                self.message_types.remove(shelly.get_message_type())
+                for dev_id, component in shelly.device_components.items():
+                    if self.device_components.get(dev_id, None) is component:
+                        del self.device_components[dev_id]
+
+                # Remove the shelly from every route it was registered on
+                for route_key in self.device_topic_routes.pop(device.id, []):
+                    routes = [route for route in self.topic_routes.get(route_key, []) if route[1] is not shelly]
+                    if routes:
+                        self.topic_routes[route_key] = routes
+                    else:
+                        # remove the route if there are no more devices using it
+                        self.topic_routes.pop(route_key, None)
+
+                self.unregister_message_type(device.id)
+                self.warmup.cancel(device.id)
 
             try:
                 del self.shellies[device.id]
             except KeyError:
                 self.logger.warning("Something went wrong! '{}' could not be removed from internal shellies dictionary".format(device.name))
 
+    def deviceUpdated(self, orig_dev, new_dev):
+        """
+        Keep the cached device object of a started device current.
+
+        :param orig_dev: The device before updates.
+        :param new_dev: The device after updates.
+        :return: None
+        """
+
+        if new_dev.id in self.device_cache:
+            self.device_cache[new_dev.id] = new_dev
+        super(Plugin, self).deviceUpdated(orig_dev, new_dev)
+
+    def deviceDeleted(self, device):
+        """
+        Forget the cached device object of a deleted device.
+
+        :param device: The deleted device.
+        :return: None
+        """
+
+        super(Plugin, self).deviceDeleted(device)
+        self.device_cache.pop(device.id, None)
+
+    def get_device(self, dev_id):
+        """
+        Get an Indigo device, from the cache if the device is started.
+
+        Started devices are kept current by ``deviceUpdated``, so reading
+        them does not need a round trip to the Indigo server.
+
+        :param dev_id: The Indigo device id.
+        :return: The device, or None if it does not exist.
+        """
+
+        device = self.device_cache.get(dev_id, None)
+        if device is None:
+            self.metrics.increment("indigo device fetches")
+            device = indigo.devices.get(dev_id, None)
+        return device
+
     def didDeviceCommPropertyChange(self, orig_dev, new_dev):
         """
         This method gets called by the default implementation of deviceUpdated() to determine if
@@ -589,6 +899,7 @@ class Plugin(indigo.PluginBase):
             component = self.get_component(device)
             if component is not None:
                 component.handle_action(action)
+        self.write_buffer.flush()
 
     def actionControlUniversal(self, action, device):
         """Handles an action being performed on the device.
@@ -607,6 +918,7 @@ class Plugin(indigo.PluginBase):
             component = self.get_component(device)
             if component is not None:
                 component.handle_action(action)
+        self.write_buffer.flush()
 
     def getDeviceStateList(self, device):
         """
@@ -667,6 +979,10 @@ class Plugin(indigo.PluginBase):
 
         if userCancelled is False:
             self.setLogLevel(valuesDict.get('log-level', "info"))
+            self.status_coalesce_window = self.get_status_coalesce_window(valuesDict)
+            self.warmup.rate = self.get_warmup_rate(valuesDict)
+            # The message thread swaps the worker pool between batches of messages
+            self.dispatcher_reconfigure = True
 
     def get_shelly_devices(self, filter="", valuesDict=None, typeId="", targetId=0):
         """
@@ -729,13 +1045,42 @@ class Plugin(indigo.PluginBase):
         :return: Component object for the device.
         """
 
-        for shelly in self.shellies.values():
-            if not isinstance(shelly, Shelly):
-                continue
-            component = shelly.get_component_for_device(device)
-            if component is not None:
-                return component
-        return None
+        return self.device_components.get(device.id, None)
+
+    def log_statistics(self, valuesDict=None, typeId=None):
+        """
+        Menu handler to write the plugin's runtime statistics to the log.
+
+        :return: None
+        """
+
+        self.logger.info("ShellyNGMQTT statistics:")
+        self.logger.info("    json decoder: {}".format(decoding.decoder_name))
+        self.logger.info("    queued notifications: {}".format(self.message_queue.qsize()))
+        self.logger.info("    queued publishes: {}".format(self.publisher.qsize()))
+        if self.dispatcher is not None:
+            self.logger.info("    message workers: {}".format(self.dispatcher.worker_count))
+            self.logger.info("    queued messages: {}".format(self.dispatcher.qsize()))
+            self.logger.info("    oldest queued message: {:.1f} ms".format(self.dispatcher.oldest_age() * 1000))
+        shellies = [shelly for shelly in list(self.shellies.values()) if isinstance(shelly, Shelly)]
+        self.logger.info("    outstanding rpcs: {}".format(sum(len(shelly.rpc) for shelly in shellies)))
+        for shelly in shellies:
+            if shelly.rpc.queue_depth:
+                self.logger.info("        \"{}\": {} rpc(s) queued".format(shelly.device.name, shelly.rpc.queue_depth))
+        self.logger.info("    active message types:")
+        for message_type, device_count in sorted(self.message_types.items()):
+            self.logger.info("        \"{}\": {} device(s)".format(message_type, device_count))
+        self.metrics.log(self.logger)
+
+    def reset_statistics(self, valuesDict=None, typeId=None):
+        """
+        Menu handler to clear the plugin's runtime statistics.
+
+        :return: None
+        """
+
+        self.metrics.reset()
+        self.logger.info("ShellyNGMQTT statistics have been reset")
 
     def setLogLevel(self, level):
         """
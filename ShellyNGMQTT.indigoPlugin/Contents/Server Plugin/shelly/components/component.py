@@ -1,5 +1,9 @@
 import indigo
 
+from ..filters import StateFilters
+from ..states import StateShadow
+from ..status_map import compile_status_fields
+
 
 class Component(object):
     """
@@ -8,6 +12,10 @@ class Component(object):
 
     component_type = None
     device_type_id = None
+    # The FILTER_GROUPS of states that can be filtered with settings on the device
+    state_filter_groups = ()
+    # The StatusFields mapped to device states by extract_status
+    status_fields = ()
 
     def __init__(self, shelly, device_id=None, comp_id=0):
         """
@@ -26,6 +34,11 @@ class Component(object):
         self.device_id = device_id
         self.logger = shelly.logger
         self.latest_config = {}
+        self.states = StateShadow(lambda: self.device, indigo.activePlugin.metrics)
+        self.state_filters = StateFilters(indigo.activePlugin.metrics, self.state_filter_groups)
+        self.status_extractor = None
+        # The shadow values the status extractor was compiled for
+        self.status_extractor_states = None
 
     @property
     def device(self):
@@ -34,7 +47,75 @@ class Component(object):
 
         :return: Indigo device
         """
-        return indigo.devices[self.device_id]
+        return indigo.activePlugin.get_device(self.device_id)
+
+    def update_states(self, updated_states):
+        """
+        Stage the states that changed to be written to the component's Indigo device.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: None
+        """
+
+        changed = self.states.diff(updated_states)
+        if changed:
+            indigo.activePlugin.write_buffer.stage_states(self.device_id, changed)
+
+    def extract_status(self, status):
+        """
+        Build the state updates of the component's ``status_fields``.
+
+        The extractor is compiled again when the state shadow is reloaded,
+        since the device may have gained or lost states.
+
+        :param status: The status of the component.
+        :return: A list of state update dicts, each with a key and value.
+        """
+
+        states = self.states.load()
+        if self.status_extractor_states is not states:
+            self.status_extractor = compile_status_fields(type(self), states)
+            self.status_extractor_states = states
+        return self.status_extractor.extract(status)
+
+    def filter_states(self, updated_states):
+        """
+        Drop state updates that are within the deadband or minimum update
+        interval configured on the component's device.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: The state updates to write.
+        """
+
+        if not self.state_filter_groups:
+            return updated_states
+        self.state_filters.configure(self.device.pluginProps)
+        return self.state_filters.apply(updated_states)
+
+    def release_filtered_states(self, now=None):
+        """
+        Write the filtered state updates that are due, since the device does
+        not send another update when the value stays the same.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: None
+        """
+
+        if not self.state_filter_groups:
+            return
+        released = self.state_filters.release_due(now)
+        if released:
+            self.update_states(released)
+
+    def set_state_image(self, image):
+        """
+        Stage the state image of the component's Indigo device.
+
+        :param image: The ``indigo.kStateImageSel`` to show.
+        :return: None
+        """
+
+        indigo.activePlugin.write_buffer.stage_image(self.device_id, image)
 
     def log_command_sent(self, message):
         """
@@ -119,7 +200,12 @@ class Component(object):
 
         # Handle base events
         if event["name"] == "config_changed":
-            self.get_config()
+            cfg_rev = event.get("cfg_rev", None)
+            if cfg_rev is None:
+                self.get_config()
+            else:
+                # The revision is only stored once its config was processed
+                self.shelly.check_config_revision(cfg_rev)
 
     def handle_notify_status(self, status):
         """
@@ -30,7 +30,7 @@ class Humidity(Component):
 
         :return: None
         """
-        self.device.updateStateImageOnServer(indigo.kStateImageSel.HumiditySensorOn)
+        self.set_state_image(indigo.kStateImageSel.HumiditySensorOn)
 
     def handle_action(self, action):
         """
@@ -88,9 +88,7 @@ class Humidity(Component):
             'offset': config.get("offset", "")
         }
 
-        props = self.device.pluginProps
-        props.update(self.latest_config)
-        self.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.device, self.latest_config)
 
     def set_config(self, config):
         """
@@ -140,10 +138,14 @@ class Humidity(Component):
         :param status: The status message
         :return:
         """
+        if error:
+            self.logger.error(error)
+            return
+
         updated_states = []
 
         humidity = status.get('rh', None)
         updated_states.append({'key': "sensorValue", 'value': humidity, 'uiValue': "{}%".format(humidity), 'decimalPlaces': 1})
 
-        self.device.updateStatesOnServer(updated_states)
+        self.update_states(updated_states)
         self.update_state_image()
@@ -45,9 +45,9 @@ class Input(Component):
         super(Input, self).handle_notify_event(event)
 
         if event["name"] == "btn_down":
-            self.device.updateStateOnServer(key='onOffState', value=True)
+            self.update_states([{'key': "onOffState", 'value': True}])
         elif event["name"] == "btn_up":
-            self.device.updateStateOnServer(key='onOffState', value=False)
+            self.update_states([{'key': "onOffState", 'value': False}])
 
     def get_config(self):
         """
@@ -77,9 +77,7 @@ class Input(Component):
             'invert': config.get("invert", False),
         }
 
-        props = self.device.pluginProps
-        props.update(self.latest_config)
-        self.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.device, self.latest_config)
 
     def set_config(self, config):
         """
@@ -130,6 +128,10 @@ class Input(Component):
         :return:
         """
 
+        if error:
+            self.logger.error(error)
+            return
+
         state = status.get('state', False)
         if state is not None:
-            self.device.updateStateOnServer(key='onOffState', value=state)
+            self.update_states([{'key': "onOffState", 'value': state}])
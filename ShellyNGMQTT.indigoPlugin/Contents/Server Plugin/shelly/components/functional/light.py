@@ -2,6 +2,7 @@
 import indigo
 
 from ..component import Component
+from ...status_map import OUTPUT_STATUS_FIELDS
 
 
 class Light(Component):
@@ -11,6 +12,8 @@ class Light(Component):
 
     component_type = "light"
     device_type_id = "component-light"
+    state_filter_groups = ("power", "current", "voltage", "temperature")
+    status_fields = OUTPUT_STATUS_FIELDS
 
     def __init__(self, shelly, device_id, comp_id=0):
         """
@@ -105,9 +108,7 @@ class Light(Component):
             'current-limit': config.get("current_limit", ""),
         }
 
-        props = self.device.pluginProps
-        props.update(self.latest_config)
-        self.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.device, self.latest_config)
 
     def set_config(self, config):
         """
@@ -155,14 +156,18 @@ class Light(Component):
         :param error:
         :return:
         """
+        if error:
+            self.logger.error(error)
+            return
+
         updated_states = []
 
         # Process output
         output = status.get('output', None)
-        if output is True and self.device.states.get('onOffState', None) is not True:
+        if output is True and self.states.get('onOffState', None) is not True:
             updated_states.append({'key': "onOffState", 'value': True})
             self.log_command_received("on")
-        elif output is False and self.device.states.get('onOffState', None) is not False:
+        elif output is False and self.states.get('onOffState', None) is not False:
             updated_states.append({'key': "onOffState", 'value': False})
             self.log_command_received("off")
 
@@ -171,41 +176,10 @@ class Light(Component):
         if brightness is not None and output is True:
             updated_states.append({'key': "brightnessLevel", 'value': brightness})
 
-        # Process temperature
-        temp_c = status.get('temperature', {}).get('tC', None)
-        if temp_c is not None and "temperature_c" in self.device.states:
-            updated_states.append({'key': "temperature_c", 'value': temp_c, 'uiValue': "{} °C".format(temp_c)})
-        temp_f = status.get('temperature', {}).get('tF', None)
-        if temp_f is not None and "temperature_f" in self.device.states:
-            updated_states.append({'key': "temperature_f", 'value': temp_f, 'uiValue': "{} °F".format(temp_f)})
-
-        # Process Power
-        power = status.get('apower', None)
-        if power is not None and "curEnergyLevel" in self.device.states:
-            updated_states.append({'key': "curEnergyLevel", 'value': power, 'uiValue': "{} W".format(power)})
-
-        # Process Voltage
-        voltage = status.get('voltage', None)
-        if voltage is not None and "voltage" in self.device.states:
-            updated_states.append({'key': "voltage", 'value': voltage, 'uiValue': "{} V".format(voltage)})
-
-        # Process Current
-        current = status.get('current', None)
-        if current is not None and "current" in self.device.states:
-            updated_states.append({'key': "current", 'value': current, 'uiValue': "{} A".format(current)})
-
-        # Process Power Factor
-        power_factor = status.get('pf', None)
-        if power_factor is not None and "power_factor" in self.device.states:
-            updated_states.append({'key': "power_factor", 'value': power_factor})
-
-        # Process Energy
-        energy_total = status.get('aenergy', {}).get('total', None)
-        if energy_total is not None and "accumEnergyTotal" in self.device.states:
-            energy_total_kwh = energy_total / 1000
-            updated_states.append({'key': "accumEnergyTotal", 'value': energy_total, 'uiValue': "{:.3f} kWh".format(energy_total_kwh)})
-
-        self.device.updateStatesOnServer(updated_states)
+        # Process temperature and power metering
+        updated_states.extend(self.extract_status(status))
+
+        self.update_states(self.filter_states(updated_states))
 
     def set(
         self,
@@ -234,10 +208,10 @@ class Light(Component):
         self.shelly.publish_rpc("Light.Set", params)
 
         if on is True:
-            self.device.updateStateOnServer(key='onOffState', value=True)
+            self.update_states([{'key': "onOffState", 'value': True}])
             self.log_command_sent("on")
         if on is False:
-            self.device.updateStateOnServer(key='onOffState', value=False)
+            self.update_states([{'key': "onOffState", 'value': False}])
             self.log_command_sent("off")
 
     def toggle(self):
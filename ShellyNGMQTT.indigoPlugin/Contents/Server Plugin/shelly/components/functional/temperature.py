@@ -11,6 +11,7 @@ class Temperature(Component):
 
     component_type = "temperature"
     device_type_id = "component-temperature"
+    state_filter_groups = ("temperature",)
 
     def __init__(self, shelly, device_id, comp_id=0):
         """
@@ -44,7 +45,7 @@ class Temperature(Component):
 
         :return: None
         """
-        self.device.updateStateImageOnServer(indigo.kStateImageSel.TemperatureSensorOn)
+        self.set_state_image(indigo.kStateImageSel.TemperatureSensorOn)
 
     def handle_action(self, action):
         """
@@ -101,9 +102,7 @@ class Temperature(Component):
             'report-threshold': config.get("report_thr_C", ""),
         }
 
-        props = self.device.pluginProps
-        props.update(self.latest_config)
-        self.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.device, self.latest_config)
 
     def set_config(self, config):
         """
@@ -153,6 +152,10 @@ class Temperature(Component):
         :param status: The status message
         :return:
         """
+        if error:
+            self.logger.error(error)
+            return
+
         updated_states = []
 
         temp_c = status.get('tC', None)
@@ -168,5 +171,5 @@ class Temperature(Component):
         elif self.device.pluginProps["unit"] == "C":
             updated_states.append({'key': "sensorValue", 'value': temp_c, 'uiValue': "{} °C".format(temp_c), 'decimalPlaces': 1})
 
-        self.device.updateStatesOnServer(updated_states)
+        self.update_states(self.filter_states(updated_states))
         self.update_state_image()
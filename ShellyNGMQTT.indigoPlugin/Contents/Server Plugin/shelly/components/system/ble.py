@@ -44,9 +44,7 @@ class BLE(Component):
             'ble-enable': config.get("enable", False)
         }
 
-        props = self.shelly.device.pluginProps
-        props.update(self.latest_config)
-        self.shelly.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.shelly.device, self.latest_config)
 
     def set_config(self, config):
         """
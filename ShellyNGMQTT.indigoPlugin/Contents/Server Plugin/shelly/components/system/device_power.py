@@ -94,7 +94,7 @@ class DevicePower(Component):
         level = status.get('battery', {}).get("percent", None)
         external = status.get('external', {}).get("present", False)
 
-        self.shelly.device.updateStatesOnServer([
+        self.shelly.update_states([
             {"key": "battery-voltage", "value": voltage, "uiValue": "{} V".format(voltage)},
             {"key": "batteryLevel", "value": level, "uiValue": "{}%".format(level)},
             {"key": "external-power", "value": external}
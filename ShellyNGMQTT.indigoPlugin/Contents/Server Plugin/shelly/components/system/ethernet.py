@@ -67,6 +67,6 @@ class Ethernet(Component):
             return
 
         if status and status.get('ip', None):
-            self.shelly.device.updateStatesOnServer([
+            self.shelly.update_states([
                 {'key': "ip-address", 'value': status.get('ip_address', None)}
             ])
@@ -1,12 +1,19 @@
 import indigo
 import os
+import threading
 
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from ..component import Component
 
 from ...devices.ShellyBLU import ShellyBLU, BLEPacketAlreadyProcessed
+from ...rpc import RpcError
 
 from typing import TypedDict
 
+# Seconds to wait on a script RPC, as a backstop for when the device is stopped
+# while a sync is running and its RPCs are no longer expired.
+SCRIPT_RPC_WAIT = 60.0
+
 
 class ScriptConfig(TypedDict):
     id: int | None
@@ -43,71 +50,58 @@ class Script(Component):
             else:
                 self.logger.debug(f"Read {len(script_data)} bytes of script data")
 
-            def inspect_scripts(list_response, error=None):
-                if error:
-                    self.logger.error(f"Unable to get current device scripts for {self.shelly.device.name}: {error['message']}")
-                    return
-
-                scripts = list_response.get("scripts", [])
-                for script in scripts:
-                    if script["name"] == script_name:
-                        self.logger.debug(f"Found existing BLU Relay script for {self.shelly.device.name}: {script}")
-                        upload(script)
-                        return
-                
-                self.logger.info(f"Creating new BLU Relay script on {self.shelly.device.name}...")
-                self.create(script_name, upload)
-
-            def upload(script, error=None):
-                if error:
-                    self.logger.error(f"Unable to get/create script for {self.shelly.device.name}: {error['message']}")
-                    return
-                
-                id = script["id"]
-                self.upload_script(id, code=script_data, callback=enable_and_start)
-
-            def enable_and_start(script, error=None):
-                if error:
-                    self.logger.error(f"Unable to upload script to {self.shelly.device.name}: {error['message']}")
-                    return
-                
-                id = script["id"]
-                self.logger.debug(f"Configuring BLU Relay script on {self.shelly.device.name}...")
-
-                def start(response, error=None):
-                    if error:
-                        self.logger.error(f"Unable to set BLU Relay script config on {self.shelly.device.name}: {error['message']}")
-                        return
-                    
-                    self.start(id, callback=complete)
-
-                self.set_config(id, name=script_name, enable=True, callback=start)
-
-            def complete(response, error=None):
-                if error:
-                    self.logger.error(f"Error occurred during BLU Relay script management on {self.shelly.device.name}: {error['message']}")
-                    return
-                
-                self.logger.info(f"BLU Relay script is synced, running, and configured to run at device boot for {self.shelly.device.name}")
-
-            self.list(inspect_scripts)
-
-    def create(self, name: str, callback):
-        """
-        Create a new script on the device with the given name.
+            # Waiting on the RPC results would block the message worker that
+            # processes the responses, so the script is synced in the background
+            thread = threading.Thread(
+                target=self.sync_script,
+                args=(script_name, script_data),
+                name="ShellyNGMQTT-script-{}".format(shelly.device_id),
+                daemon=True
+            )
+            thread.start()
 
-        Parameters
-        ----------
-        name: str
-            The name of the script to create.
+    def sync_script(self, script_name: str, script_data: str):
         """
-        self.shelly.publish_rpc("Script.Create", {"name": name}, callback)
+        Upload a script to the device and configure it to run at boot.
 
-    def list(self, callback):
-        """
-        List out scripts already on the device.
+        The script is created when the device does not have it yet. This
+        waits on every RPC, so it must not be called from a message worker.
+
+        :param script_name: The name of the script on the device.
+        :param script_data: The code of the script.
+        :return: None
         """
-        self.shelly.publish_rpc("Script.List", {}, callback)
+        device_name = self.shelly.device.name
+        step = "get current device scripts"
+        try:
+            scripts = self.shelly.call("Script.List").result(SCRIPT_RPC_WAIT).get("scripts", [])
+            script = next((script for script in scripts if script["name"] == script_name), None)
+            if script:
+                self.logger.debug(f"Found existing BLU Relay script for {device_name}: {script}")
+            else:
+                self.logger.info(f"Creating new BLU Relay script on {device_name}...")
+                step = "create script"
+                script = self.shelly.call("Script.Create", {"name": script_name}).result(SCRIPT_RPC_WAIT)
+
+            id = script["id"]
+            step = "upload script"
+            self.upload_script(id, code=script_data)
+
+            self.logger.debug(f"Configuring BLU Relay script on {device_name}...")
+            step = "set BLU Relay script config"
+            config = {"id": id, "config": {"id": id, "name": script_name, "enable": True}}
+            self.shelly.call("Script.SetConfig", config).result(SCRIPT_RPC_WAIT)
+
+            step = "start BLU Relay script"
+            self.shelly.call("Script.Start", {"id": id}).result(SCRIPT_RPC_WAIT)
+        except RpcError as error:
+            self.logger.error(f"Unable to {step} for {device_name}: {error.message}")
+            return
+        except FutureTimeoutError:
+            self.logger.error(f"Unable to {step} for {device_name}: no response")
+            return
+
+        self.logger.info(f"BLU Relay script is synced, running, and configured to run at device boot for {device_name}")
 
     def get_status(self, id: int = -1, callback=None):
         """
@@ -159,72 +153,29 @@ class Script(Component):
         }
         self.shelly.publish_rpc("Script.SetConfig", payload, callback)
 
-    def start(self, id: int, callback):
-        """
-        Start a script.
+    def upload_script(self, id: int, code: str):
         """
-        self.shelly.publish_rpc("Script.Start", {"id": id}, callback)
+        A helper utility to stop a script and upload its entire code as multiple chunks.
 
-    def stop(self, id: int, callback):
-        """
-        Stop a script.
-        """
-        self.shelly.publish_rpc("Script.Stop", {"id": id}, callback)
-
-    def put_code(self, id: int, code: str, append: bool, callback):
-        """
-        Put code into the script.
-
-        Multiple chunks must be uploaded if the total code length is greater than 1024
-        bytes. The script must also be stopped.
-        """
-        self.logger.debug(f"Uploading {len(code)} bytes to script:{id} on {self.shelly.device.name}...")
-        self.shelly.publish_rpc(
-            "Script.PutCode",
-            {
-                "id": id,
-                "code": code,
-                "append": append
-            },
-            callback
-        )
+        This waits on every RPC, so it must not be called from a message worker.
 
-    def upload_script(self, id: int, code: str, callback=None):
+        :raises RpcError: If any chunk could not be uploaded.
         """
-        A helper utility to upload an entire script as multiple chunks.
-        """        
         chunk_size = 1024
-        chunks: list[str] = []
-        for i in range(0, len(code), chunk_size):
-            chunks.append({
-                "id": i / chunk_size,
-                "code": code[i:i+chunk_size]
-            })
-
-        progress = {
-            "total_bytes": len(code),
-            "uploaded_bytes": 0
-        }
-
-        def upload_chunks(status, error=None):
-            if error:
-                self.logger.error(f"Unable to upload script data chunk: {error['message']}")
-                return
+        self.shelly.call("Script.Stop", {"id": id}).result(SCRIPT_RPC_WAIT)
 
-            if len(chunks) > 0:
-                chunk = chunks.pop(0)
-                chunk_id = chunk["id"]
-                append = chunk_id != 0
-                code = chunk["code"]
-                self.put_code(id, code=code, append=append, callback=upload_chunks)
-
-                progress["uploaded_bytes"] += len(code)
-                progress_pct = progress["uploaded_bytes"] / progress["total_bytes"] * 100
-                self.logger.info(f"Syncing script:{id} on {self.shelly.device.name}... ({progress_pct:.0f}%)")
-            elif callback:
-                callback({"id": id})
+        for offset in range(0, len(code), chunk_size):
+            chunk = code[offset:offset + chunk_size]
+            self.logger.debug(f"Uploading {len(chunk)} bytes to script:{id} on {self.shelly.device.name}...")
+            params = {
+                "id": id,
+                "code": chunk,
+                "append": offset != 0
+            }
+            self.shelly.call("Script.PutCode", params).result(SCRIPT_RPC_WAIT)
 
-        self.stop(id, callback=upload_chunks)
+            progress_pct = min(offset + chunk_size, len(code)) / len(code) * 100
+            self.logger.info(f"Syncing script:{id} on {self.shelly.device.name}... ({progress_pct:.0f}%)")
 
     def handle_notify_event(self, event):
         super(Script, self).handle_notify_event(event)
@@ -54,10 +54,8 @@ class System(Component):
             'version': config.get("device", {}).get("fw_id", "").split("/")[-1]
         }
 
-        props = self.shelly.device.pluginProps
-        props.update(self.latest_config)
-        self.shelly.device.replacePluginPropsOnServer(props)
-        self.shelly.device.updateStateOnServer("current-firmware", config.get("device", {}).get("fw_id", ""))
+        self.shelly.update_props(self.shelly.device, self.latest_config)
+        self.shelly.update_states([{'key': "current-firmware", 'value': config.get("device", {}).get("fw_id", "")}])
 
     def set_config(self, config):
         """
@@ -112,9 +110,12 @@ class System(Component):
             self.logger.error(error)
             return
 
-        self.shelly.device.updateStatesOnServer([
+        self.shelly.update_states([
             {'key': "mac-address", 'value': status.get('mac', None)},
             {'key': "uptime", 'value': status.get('uptime', None)},
             {'key': "available-firmware", 'value': status.get('available_updates', {}).get('stable', {}).get('version', None)},
             {'key': "available-beta-firmware", 'value': status.get('available_updates', {}).get('beta', {}).get('version', None)}
         ])
+
+        # Only fetch the config when it changed since it was last fetched
+        self.shelly.check_config_revision(status.get('cfg_rev', None))
@@ -71,9 +71,7 @@ class WiFi(Component):
             'wifi-roaming-interval': config.get("roam", {}).get("interval", "")
         }
 
-        props = self.shelly.device.pluginProps
-        props.update(self.latest_config)
-        self.shelly.device.replacePluginPropsOnServer(props)
+        self.shelly.update_props(self.shelly.device, self.latest_config)
 
     def set_config(self, config):
         """
@@ -129,7 +127,7 @@ class WiFi(Component):
             return
 
         if status and status.get('ssid', None):
-            self.shelly.device.updateStatesOnServer([
+            self.shelly.update_states([
                 {'key': "ssid", 'value': status.get('ssid', None)},
                 {'key': "rssi", 'value': status.get('rssi', None)},
                 {'key': "ip-address", 'value': status.get('sta_ip', None)}
@@ -0,0 +1,62 @@
+import json
+import re
+
+# Use the fastest available decoder, falling back to the standard library
+try:
+    import orjson as _decoder
+    decoder_name = "orjson"
+except ImportError:
+    try:
+        import ujson as _decoder
+        decoder_name = "ujson"
+    except ImportError:
+        _decoder = json
+        decoder_name = "json"
+
+
+def loads(payload):
+    """
+    Decode a JSON payload.
+
+    :param payload: The JSON text (str or bytes).
+    :return: The decoded object.
+    :raises ValueError: If the payload is not valid JSON.
+    """
+
+    return _decoder.loads(payload)
+
+
+class StatusPreScanner(object):
+    """
+    Cheaply checks if a NotifyStatus payload could mention any component type
+    that a device has registered, so payloads only about other components
+    (ex: ``cloud``, ``ws``) can be skipped without being decoded.
+
+    The check is conservative: a nested key with the same name as a component
+    type only means the payload gets decoded.
+    """
+
+    def __init__(self, component_types):
+        """
+        Compile the scanner for a set of component types.
+
+        :param component_types: The component types registered on the device.
+        """
+
+        component_types = sorted(set(component_type for component_type in component_types if component_type))
+        if component_types:
+            self.pattern = re.compile(r'"(?:{})(?::\d+)?"\s*:'.format("|".join(re.escape(t) for t in component_types)))
+        else:
+            self.pattern = None
+
+    def may_concern(self, payload):
+        """
+        Check if a status payload may contain a registered component.
+
+        :param payload: The JSON text of a NotifyStatus/NotifyFullStatus message.
+        :return: False only if no registered component can be in the payload.
+        """
+
+        if self.pattern is None:
+            return False
+        return self.pattern.search(payload) is not None
@@ -1,7 +1,52 @@
 import indigo # noqa
+import functools
 import json
 import logging
-import uuid
+import time
+
+from concurrent.futures import Future
+
+from .. import decoding
+from ..states import StateShadow
+from ..status_map import changes_only_metering, merge_status
+from ..rpc import RpcError, RpcManager, SingleFlight, RPC_EVICTED_ERROR, RPC_TIMEOUT_ERROR, is_session_rpc_id, next_rpc_id
+
+
+def normalize_prop(value):
+    """
+    Normalize a prop value for comparison, since Indigo may store values
+    with a different type than they were set with.
+
+    :param value: The prop value.
+    :return: The normalized value.
+    """
+
+    if value is None:
+        return ""
+    return str(value)
+
+
+# Cache of parsed component keys, ex: "switch:0" -> ("switch", 0)
+_component_keys = {}
+
+
+def parse_component_key(component):
+    """
+    Split a component key into its type and instance id.
+
+    :param component: The component key, ex: "switch:0" or "sys".
+    :return: A tuple of the component type and instance id (None when the key has no id).
+    """
+
+    parsed = _component_keys.get(component, None)
+    if parsed is None:
+        component_parts = component.split(':')
+        if len(component_parts) == 2:
+            parsed = (component_parts[0], int(component_parts[1]))
+        else:
+            parsed = (component, None)
+        _component_keys[component] = parsed
+    return parsed
 
 
 class Shelly(object):
@@ -19,11 +64,31 @@ class Shelly(object):
 
         self.device_id = device_id
         self._device = None
+        self._components = []
+        self._system_components = {}
+        # Lookup of components by (component_type, comp_id)
+        self.component_index = {}
+        # Components with comp_id -1 that handle any comp_id of their type
+        self.wildcard_components = {}
+        # Lookup of components by the id of their own Indigo device
+        self.device_components = {}
         self.functional_components = []
         self.system_components = {}
         self.component_devices = {}
         self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
-        self.rpc_callbacks = {}
+        self.states = StateShadow(lambda: self.device, indigo.activePlugin.metrics)
+        self.rpc = RpcManager(indigo.activePlugin.metrics, self.send_rpc)
+        self.single_flight = SingleFlight(indigo.activePlugin.metrics)
+
+        # Component status waiting to be processed, keyed by (component_type, instance_id)
+        self.pending_status = {}
+        self.status_flush_due = None
+        self._status_scanner = None
+
+        # The config revision (Sys cfg_rev) the latest config fetch was made for
+        self.cfg_rev = self.get_stored_config_revision()
+        # Props staged while a full config is processed, keyed by Indigo device id
+        self.staged_props = None
 
         # Inspect devices in the group to find all components
         group_ids = indigo.device.getGroupList(self.device)
@@ -32,7 +97,7 @@ class Shelly(object):
                 device = indigo.devices[dev_id]
                 self.component_devices[device.model] = device
 
-        self.device.updateStateImageOnServer(indigo.kStateImageSel.NoImage)
+        self.set_state_image(indigo.kStateImageSel.NoImage)
 
     @property
     def device(self):
@@ -41,12 +106,23 @@ class Shelly(object):
 
         :return: Indigo device
         """
-        device = indigo.devices.get(self.device_id, None)
+        device = indigo.activePlugin.get_device(self.device_id)
         # Keep track of the last known device object
         if device is not None:
             self._device = device
         return self._device
 
+    @property
+    def status_scanner(self):
+        """
+        Getter for the pre-scanner that finds status payloads for unused components.
+
+        :return: A StatusPreScanner for the types of all registered components.
+        """
+        if self._status_scanner is None:
+            self._status_scanner = decoding.StatusPreScanner(component.component_type for component in self.components)
+        return self._status_scanner
+
     @property
     def components(self):
         """
@@ -54,17 +130,279 @@ class Shelly(object):
 
         :return: A list of all functional and system components.
         """
-        return self.functional_components + list(self.system_components.values())
+        return self._components
+
+    @property
+    def system_components(self):
+        """
+        Getter for the system components, keyed by name.
+
+        :return: A dict of system components.
+        """
+        return self._system_components
+
+    @system_components.setter
+    def system_components(self, system_components):
+        """
+        Setter for the system components that keeps the component index up to date.
+
+        :param system_components: A dict of system components keyed by name.
+        :return: None
+        """
+        self._system_components = system_components
+        self.index_components()
+
+    def index_components(self):
+        """
+        Rebuild the list of all components and the component lookup index.
+
+        When several components share a type and id, the first one (functional
+        components before system components) is found, as before.
+
+        :return: None
+        """
+        components = self.functional_components + list(self._system_components.values())
+        component_index = {}
+        wildcard_components = {}
+        for component in components:
+            if component.comp_id == -1:
+                wildcard_components.setdefault(component.component_type, component)
+            else:
+                component_index.setdefault((component.component_type, component.comp_id), component)
+
+        self._components = components
+        self.component_index = component_index
+        self.wildcard_components = wildcard_components
+        self._status_scanner = None
+
+    def update_states(self, updated_states):
+        """
+        Stage the states that changed to be written to the Indigo device.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: None
+        """
+
+        changed = self.states.diff(updated_states)
+        if changed:
+            indigo.activePlugin.write_buffer.stage_states(self.device_id, changed)
+
+    def set_state_image(self, image):
+        """
+        Stage the state image of the Indigo device.
+
+        :param image: The ``indigo.kStateImageSel`` to show.
+        :return: None
+        """
+
+        indigo.activePlugin.write_buffer.stage_image(self.device_id, image)
 
     def get_config(self):
         """
-        Gets the config for all components
+        Gets the config for all components, with one RPC per component.
+
+        Prefer ``get_full_config`` unless only some components need a refresh.
 
         :return: None
         """
         for component in self.components:
             component.get_config()
 
+    def get_full_config(self, cfg_rev=None):
+        """
+        Gets the config for all components with a single RPC.
+
+        :param cfg_rev: The config revision being fetched, stored once the config is processed.
+        :return: None
+        """
+        self.publish_rpc("Shelly.GetConfig", {}, callback=functools.partial(self.process_full_config, cfg_rev=cfg_rev))
+
+    def process_full_config(self, config, error=None, cfg_rev=None):
+        """
+        Hand each component its part of the device config.
+
+        :param config: The config of all components, keyed by component.
+        :param error: Any errors.
+        :param cfg_rev: The config revision that was fetched, if known.
+        :return: None
+        """
+
+        if error:
+            self.logger.error("\"{}\": unable to get config: {}".format(self.device.name, error))
+            if cfg_rev is not None and self.cfg_rev == cfg_rev:
+                # Fetch again on the next status
+                self.cfg_rev = None
+            return
+
+        # Merge the props of every component sharing a device into one write
+        self.staged_props = {}
+        try:
+            self.route_component_data(config, "process_config")
+            if cfg_rev is not None:
+                self.store_config_revision(cfg_rev)
+        except Exception:
+            if cfg_rev is not None and self.cfg_rev == cfg_rev:
+                # Fetch again on the next status
+                self.cfg_rev = None
+            raise
+        finally:
+            self.flush_props()
+
+    def check_config_revision(self, cfg_rev):
+        """
+        Fetch the config of all components if the device's config revision
+        changed since the last fetch.
+
+        :param cfg_rev: The ``cfg_rev`` reported in the Sys status or a config_changed event.
+        :return: None
+        """
+
+        if cfg_rev is None:
+            return
+        if cfg_rev == self.cfg_rev:
+            indigo.activePlugin.metrics.increment("config fetches skipped")
+            return
+        self.request_full_config(cfg_rev)
+
+    def request_full_config(self, cfg_rev=None):
+        """
+        Fetch the config of all components for a config revision.
+
+        :param cfg_rev: The config revision, or None if it is unknown.
+        :return: None
+        """
+
+        self.cfg_rev = cfg_rev
+        self.get_full_config(cfg_rev)
+
+    def get_stored_config_revision(self):
+        """
+        Get the config revision whose config is stored in the device props.
+
+        The revision is only trusted if it was stored by this plugin version,
+        since another version may store different config props.
+
+        :return: The config revision, or None if it is unknown.
+        """
+
+        props = self.device.pluginProps
+        if props.get('cfg-rev-version', None) != indigo.activePlugin.pluginVersion:
+            return None
+        try:
+            return int(props.get('cfg-rev', None))
+        except (TypeError, ValueError):
+            return None
+
+    def store_config_revision(self, cfg_rev):
+        """
+        Remember the config revision whose config is stored in the device props.
+
+        :param cfg_rev: The config revision.
+        :return: None
+        """
+
+        self.update_props(self.device, {
+            'cfg-rev': str(cfg_rev),
+            'cfg-rev-version': indigo.activePlugin.pluginVersion
+        })
+
+    def update_props(self, device, values):
+        """
+        Update props of an Indigo device. While a full config is processed the
+        values are staged and written by ``flush_props``.
+
+        :param device: The Indigo device.
+        :param values: The props to set.
+        :return: None
+        """
+
+        if self.staged_props is not None:
+            self.staged_props.setdefault(device.id, {}).update(values)
+            indigo.activePlugin.metrics.increment("props updates staged")
+            return
+        self.write_props(device, values)
+
+    def flush_props(self):
+        """
+        Write the staged props with a single write per device.
+
+        :return: None
+        """
+
+        staged, self.staged_props = self.staged_props, None
+        for dev_id, values in (staged or {}).items():
+            device = indigo.activePlugin.get_device(dev_id)
+            if device is not None:
+                self.write_props(device, values)
+
+    def write_props(self, device, values):
+        """
+        Write props of an Indigo device, skipping the write when every value is already set.
+
+        :param device: The Indigo device.
+        :param values: The props to set.
+        :return: True if the props were written.
+        """
+
+        props = device.pluginProps
+        if all(normalize_prop(props.get(key, None)) == normalize_prop(value) for key, value in values.items()):
+            indigo.activePlugin.metrics.increment("props writes skipped")
+            return False
+
+        props.update(values)
+        device.replacePluginPropsOnServer(props)
+        indigo.activePlugin.metrics.increment("props writes")
+        return True
+
+    def get_full_status(self):
+        """
+        Gets the status for all components with a single RPC.
+
+        :return: None
+        """
+        self.publish_rpc("Shelly.GetStatus", {}, callback=self.process_full_status)
+
+    def process_full_status(self, status, error=None):
+        """
+        Hand each component its part of the device status.
+
+        :param status: The status of all components, keyed by component.
+        :param error: Any errors.
+        :return: None
+        """
+
+        indigo.activePlugin.warmup.complete(self.device_id, success=not error)
+        if error:
+            self.logger.error("\"{}\": unable to get status: {}".format(self.device.name, error))
+            return
+
+        # The System component checks the config revision when it gets its status
+        if status.get('sys', {}).get('cfg_rev', None) is None or self.get_component(component_type="sys") is None:
+            self.request_full_config()
+        self.route_component_data(status, "process_status")
+
+    def route_component_data(self, data, method_name):
+        """
+        Pass each "type:id" entry of a Shelly.GetConfig or Shelly.GetStatus
+        result to the matching component. Entries for components that are
+        not registered, or that don't implement the method, are skipped.
+
+        :param data: The result, keyed by component.
+        :param method_name: The name of the component method to call.
+        :return: None
+        """
+
+        for component_key, component_data in data.items():
+            component_type, instance_id = parse_component_key(component_key)
+            component = self.get_component(component_type=component_type, comp_id=instance_id)
+            if component is None:
+                continue
+
+            try:
+                getattr(component, method_name)(component_data)
+            except NotImplementedError:
+                continue
+
     #
     # Property getters
     #
@@ -115,10 +453,7 @@ class Shelly(object):
         :return: Component
         """
 
-        for component in self.components:
-            if component.device_id and component.device_id == device.id:
-                return component
-        return None
+        return self.device_components.get(device.id, None)
 
     def get_topics(self):
         """
@@ -137,6 +472,27 @@ class Shelly(object):
                 "{}/events/rpc".format(address)
             ]
 
+    def get_topic_routes(self):
+        """
+        Map each subscribed topic, split into its parts, to the kind of topic.
+
+        The kind is passed to ``handle_message`` so incoming messages can be
+        dispatched without formatting or comparing topic strings.
+
+        :return: A dict of topic part tuples to topic kinds.
+        """
+
+        address = self.get_address()
+        if address is None:
+            return {}
+        else:
+            address_parts = tuple(address.split('/'))
+            return {
+                address_parts + ('online',): "online",
+                address_parts + ('rpc',): "rpc",
+                address_parts + ('events', 'rpc'): "events"
+            }
+
     def get_device_state_list(self):
         """
         Build the device state list for the device.
@@ -193,12 +549,10 @@ class Shelly(object):
         :return: The MQTT Connector plugin if it is running, otherwise None.
         """
 
-        mqtt = indigo.server.getPlugin("com.flyingdiver.indigoplugin.mqtt")
-        if not mqtt.isEnabled():
+        mqtt = indigo.activePlugin.get_mqtt_plugin()
+        if mqtt is None:
             self.logger.error("MQTT plugin must be enabled!")
-            return None
-        else:
-            return mqtt
+        return mqtt
 
     def subscribe(self):
         """
@@ -220,109 +574,196 @@ class Shelly(object):
         """
         Publishes a message on a given topic to the device's broker.
 
+        The message is queued for the plugin's sender thread, so this returns
+        without waiting for the MQTT Connector.
+
         :param topic: The topic to send data to.
         :param payload: The data to send over the topic.
         :return: None
         """
 
-        mqtt = self.get_mqtt()
-        if mqtt is not None:
-            props = {
-                'topic': topic,
-                'payload': payload,
-                'qos': 0,
-                'retain': 0,
-            }
-            mqtt.executeAction("publish", deviceId=self.get_broker_id(), props=props, waitUntilDone=False)
+        indigo.activePlugin.publisher.publish(self.get_broker_id(), topic, payload)
+        if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug("\"%s\" published \"%s\" to \"%s\"", self.device.name, payload, topic)
 
-    def publish_rpc(self, method: str, params: dict = None, callback=None) -> None:
+    def publish_rpc(self, method: str, params: dict = None, callback=None, timeout: float = None) -> None:
         """
-
-        :return:
+        Send an RPC to the device.
+
+        Only a few RPCs are in flight per device at once, so the RPC may be
+        queued and sent once earlier RPCs are answered. The callback is called
+        with (result, error) when the response arrives, or with
+        ``RPC_TIMEOUT_ERROR`` when no response arrives in time after sending.
+        Read-only ``Get*`` calls that are identical to one still in flight
+        share its response instead of being sent again.
+
+        :param method: The RPC method to call.
+        :param params: The parameters for the method.
+        :param callback: Optional function to call with the response.
+        :param timeout: Optional seconds to wait for the response instead of the default.
+        :return: None
         """
 
-        rpc_id = uuid.uuid4().hex
         if not params:
             params = {}
-        if callback:
-            self.rpc_callbacks[rpc_id] = callback
+        if callback and method.rpartition('.')[2].startswith("Get"):
+            key = (method, json.dumps(params, sort_keys=True))
+            if self.single_flight.join(key, callback):
+                return
+            callback = functools.partial(self.finish_single_flight, key)
+
+        rpc_id = next_rpc_id()
         rpc = {
             'id': rpc_id,
             'src': self.get_address(),
             'method': method,
             'params': params
         }
-        self.publish("{}/rpc".format(self.get_address()), json.dumps(rpc))
+        for message, evicted in self.rpc.submit(rpc_id, json.dumps(rpc), callback, timeout):
+            if evicted is None:
+                self.logger.warning("\"%s\" dropped %s, too many RPCs are waiting to be sent",
+                                    self.device.name, json.loads(message)['method'])
+            else:
+                self.call_rpc_callback(evicted, None, RPC_EVICTED_ERROR)
+
+    def finish_single_flight(self, key, result, error=None):
+        """
+        Pass the response of a shared RPC to every caller waiting on it.
+
+        :param key: The single-flight key of the RPC.
+        :param result: The RPC result.
+        :param error: The RPC error.
+        :return: None
+        """
+
+        for callback in self.single_flight.finish(key):
+            self.call_rpc_callback(callback, result, error)
+
+    def send_rpc(self, payload):
+        """
+        Publish an RPC that was let into the in-flight window.
+
+        :param payload: The JSON text of the RPC.
+        :return: None
+        """
+
+        self.publish("{}/rpc".format(self.get_address()), payload)
+
+    def call(self, method: str, params: dict = None, timeout: float = None) -> Future:
+        """
+        Send an RPC to the device and get a future for its result.
+
+        The future raises ``RpcError`` when the device returns an error or
+        does not respond in time. Never wait on the future from a message
+        worker, since the response is processed by that same worker.
+
+        :param method: The RPC method to call.
+        :param params: The parameters for the method.
+        :param timeout: Optional seconds to wait for the response instead of the default.
+        :return: A future for the result of the RPC.
+        """
+
+        future = Future()
+
+        def resolve(result, error=None):
+            if error:
+                future.set_exception(RpcError(error))
+            else:
+                future.set_result(result)
+
+        self.publish_rpc(method, params, resolve, timeout)
+        return future
+
+    def expire_rpcs(self):
+        """
+        Fail every RPC that did not receive a response before its deadline.
+
+        :return: None
+        """
+
+        expired = self.rpc.expire()
+        if expired:
+            self.logger.debug("\"%s\" %d RPC(s) timed out", self.device.name, len(expired))
+        for callback in expired:
+            self.call_rpc_callback(callback, None, RPC_TIMEOUT_ERROR)
+
+    def call_rpc_callback(self, callback, result, error):
+        """
+        Call an RPC callback, logging instead of raising any exception so
+        other callbacks still get called.
+
+        :param callback: The callback to call.
+        :param result: The RPC result.
+        :param error: The RPC error.
+        :return: None
+        """
+
+        try:
+            callback(result, error)
+        except Exception:
+            self.logger.exception("Error in RPC callback for \"{}\"".format(self.device.name))
 
     #
     # Handlers
     #
 
-    def handle_message(self, topic, payload):
+    def handle_message(self, topic_kind, payload):
         """
         The default handler for incoming messages.
         These are messages that are handled by ANY Shelly device.
 
-        :param topic: The topic of the incoming message.
+        :param topic_kind: The kind of topic the message arrived on (see ``get_topic_routes``).
         :param payload: The content of the massage.
         :return:  None
         """
 
-        if topic == "{}/online".format(self.get_address()):
+        if topic_kind == "online":
             is_online = (payload == "true")
-            self.device.updateStateOnServer(key='online', value=is_online)
-        elif topic == "{}/rpc".format(self.get_address()):
-            rpc = json.loads(payload)
+            self.update_states([{'key': "online", 'value': is_online}])
+        elif topic_kind == "rpc":
+            # Process older coalesced status before a response that may be newer
+            self.flush_status()
+            rpc = decoding.loads(payload)
             # Only process a response, which does not have a method
             if 'method' not in rpc:
                 rpc_id = rpc.get('id', None)
+                if not is_session_rpc_id(rpc_id):
+                    # A late response to a request sent before the plugin restarted
+                    indigo.activePlugin.metrics.increment("rpc stray responses")
+                    return None
                 result = rpc.get('result', None)
                 error = rpc.get('error', None)
-                callback = self.rpc_callbacks.get(rpc_id, None)
+                callback = self.rpc.resolve(rpc_id)
                 if callback:
                     callback(result, error)
-                    del self.rpc_callbacks[rpc_id]
-        elif topic == "{}/events/rpc".format(self.get_address()):
-            rpc = json.loads(payload)
+        elif topic_kind == "rpc-expire":
+            self.expire_rpcs()
+        elif topic_kind == "events":
+            if '"NotifyStatus"' in payload and not self.status_scanner.may_concern(payload):
+                # None of the components in this status are used by the device
+                indigo.activePlugin.metrics.increment("status messages skipped")
+                return None
+
+            rpc = decoding.loads(payload)
             method = rpc.get('method', None)
             params = rpc.get('params', {})
 
             if method in ("NotifyStatus", "NotifyFullStatus"):
-                for component in params.keys():
+                for component, status in params.items():
                     # Ignore the timestamp since it is not a component
                     if component == "ts":
                         continue
 
                     # Parse the component type and instance ID
-                    component_type = None
-                    instance_id = None
-                    if ':' in component:
-                        component_parts = component.split(':')
-                        if len(component_parts) == 2:
-                            component_type = component_parts[0]
-                            instance_id = int(component_parts[1])
-                        else:
-                            component_type = component
-                    else:
-                        component_type = component
-
-                    status = params[component]
-                    self.handle_notify_status(component_type, instance_id, status)
+                    component_type, instance_id = parse_component_key(component)
+                    self.queue_notify_status(component_type, instance_id, status)
             elif method == "NotifyEvent":
+                # Events pass through unmerged, but after the status that preceded them
+                self.flush_status()
                 for e in params.get('events', []):
-                    component = e.get('component', "")
-                    component_type = None
-                    instance_id = 0
-                    if ':' in component:
-                        component_parts = component.split(':')
-                        if len(component_parts) == 2:
-                            component_type = component_parts[0]
-                            instance_id = int(component_parts[1])
-                        else:
-                            component_type = component
-                    else:
-                        component_type = component
+                    component_type, instance_id = parse_component_key(e.get('component', ""))
+                    if instance_id is None:
+                        instance_id = 0
 
                     e["name"] = e["event"]
                     del e["event"]
@@ -330,6 +771,88 @@ class Shelly(object):
 
         return None
 
+    def queue_notify_status(self, component_type, instance_id, status):
+        """
+        Coalesce a component's status with any status for the same component
+        received within the plugin's status coalesce window.
+
+        Metered devices send a NotifyStatus for every small change in power,
+        so merging them into a single status greatly reduces Indigo writes.
+        The merged status is processed by ``flush_status`` once the window
+        has passed. Only measurements are coalesced. Any other change (ex: an
+        output or input turning on) is processed right away, after the
+        status that is already waiting, so no transition is lost or delayed.
+
+        :param component_type: The component type.
+        :param instance_id: The identifier of the component.
+        :param status: Data for the notification.
+        :return: None
+        """
+
+        window = indigo.activePlugin.status_coalesce_window
+        if window <= 0:
+            self.handle_notify_status(component_type, instance_id, status)
+            return
+
+        key = (component_type, instance_id)
+        pending = self.pending_status.get(key, None)
+        if not changes_only_metering(pending, status):
+            self.flush_status()
+            self.handle_notify_status(component_type, instance_id, status)
+            return
+
+        if pending is None:
+            self.pending_status[key] = status
+        else:
+            merge_status(pending, status)
+            indigo.activePlugin.metrics.increment("status messages coalesced")
+
+        if self.status_flush_due is None:
+            self.status_flush_due = time.monotonic() + window
+
+    def flush_status(self):
+        """
+        Process all coalesced component status.
+
+        :return: None
+        """
+
+        self.release_filtered_states()
+        if not self.pending_status:
+            return
+
+        pending_status = self.pending_status
+        self.pending_status = {}
+        self.status_flush_due = None
+        for (component_type, instance_id), status in pending_status.items():
+            self.handle_notify_status(component_type, instance_id, status)
+
+    def release_filtered_states(self):
+        """
+        Write the filtered component states that are due.
+
+        :return: None
+        """
+
+        now = time.monotonic()
+        for component in self.functional_components:
+            component.release_filtered_states(now)
+
+    def next_flush_due(self):
+        """
+        When ``flush_status`` should be called next, to process coalesced
+        status or to write filtered states.
+
+        :return: The ``time.monotonic()`` it is due at, or None if nothing is waiting.
+        """
+
+        due = self.status_flush_due
+        for component in self.functional_components:
+            component_due = component.state_filters.next_due()
+            if component_due is not None and (due is None or component_due < due):
+                due = component_due
+        return due
+
     def handle_notify_status(self, component_type, instance_id, status):
         """
         Default handler for NotifyStatus RPC messages.
@@ -369,9 +892,8 @@ class Shelly(object):
         """
 
         if action.deviceAction == indigo.kDeviceAction.RequestStatus:
-            self.get_config()
-            for component in self.system_components.values():
-                component.get_status()
+            self.get_full_config()
+            self.get_full_status()
 
     #
     # Utilities
@@ -429,6 +951,8 @@ class Shelly(object):
             device.model = name
             device.replaceOnServer()
             self.component_devices[name] = device
+            # The new device has no config yet, so the config must be fetched
+            self.cfg_rev = None
 
         device = self.component_devices.get(name, None)
         if device is None:
@@ -444,6 +968,8 @@ class Shelly(object):
         # Create the component
         component = component_class(self, device.id, comp_id)
         self.functional_components.append(component)
+        self.device_components.setdefault(device.id, component)
+        self.index_components()
         return component
 
     def get_component(self, component_class=None, component_type=None, comp_id=0):
@@ -458,6 +984,13 @@ class Shelly(object):
         if comp_id is None:
             comp_id = 0
 
+        if component_class is None and component_type is not None:
+            component = self.component_index.get((component_type, comp_id), None)
+            if component is None:
+                # Special case: let a component with id -1 handle any comp_id message
+                component = self.wildcard_components.get(component_type, None)
+            return component
+
         for component in self.components:
             if component_class is not None and not isinstance(component, component_class):
                 continue
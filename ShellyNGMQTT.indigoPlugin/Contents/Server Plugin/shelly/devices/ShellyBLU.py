@@ -1,8 +1,11 @@
 import indigo # noqa
 import json
 import logging
+import threading
 import uuid
 
+from ..states import StateShadow
+
 
 class BLEPacketAlreadyProcessed(Exception):
     """A BLE Packet was already processed."""
@@ -24,8 +27,11 @@ class ShellyBLU(object):
         self.device_id = device_id
         self._device = None
         self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
+        self.states = StateShadow(lambda: self.device, indigo.activePlugin.metrics)
+        # Packets relayed by several Shellies are processed by several workers
+        self.packet_lock = threading.Lock()
 
-        self.device.updateStateImageOnServer(indigo.kStateImageSel.NoImage)
+        self.set_state_image(indigo.kStateImageSel.NoImage)
 
     @property
     def device(self):
@@ -34,12 +40,34 @@ class ShellyBLU(object):
 
         :return: Indigo device
         """
-        device = indigo.devices.get(self.device_id, None)
+        device = indigo.activePlugin.get_device(self.device_id)
         # Keep track of the last known device object
         if device is not None:
             self._device = device
         return self._device
     
+    def update_states(self, updated_states):
+        """
+        Stage the states that changed to be written to the Indigo device.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: None
+        """
+
+        changed = self.states.diff(updated_states)
+        if changed:
+            indigo.activePlugin.write_buffer.stage_states(self.device_id, changed)
+
+    def set_state_image(self, image):
+        """
+        Stage the state image of the Indigo device.
+
+        :param image: The ``indigo.kStateImageSel`` to show.
+        :return: None
+        """
+
+        indigo.activePlugin.write_buffer.stage_image(self.device_id, image)
+
     def get_address(self):
         address = self.device.pluginProps.get('address', None)
         if not address or address == '':
@@ -79,11 +107,6 @@ class ShellyBLU(object):
         return indigo.PluginBase.getDeviceDisplayStateId(indigo.activePlugin, self.device)
     
     def process_packet(self, packet: dict):
-        pid = packet.get("pid", -1)
-        if pid == self.device.states.get("pid", -1):
-            self.logger.debug(f"Not processing duplicated packet: {packet}")
-            raise BLEPacketAlreadyProcessed(f"BLE packet (pid={pid}) already processed!")
-
         state_updates = []
 
         state_updates.append({'key': "encryption", 'value': packet.get("encryption", False)})
@@ -92,4 +115,10 @@ class ShellyBLU(object):
         state_updates.append({'key': "rssi", 'value': packet.get("rssi", 999)})
         state_updates.append({'key': "address", 'value': packet.get("address", "UNKNOWN")})
 
-        self.device.updateStatesOnServer(state_updates)
\ No newline at end of file
+        pid = packet.get("pid", -1)
+        with self.packet_lock:
+            # Check and record the packet id at once, so a packet relayed twice is only processed once
+            if pid == self.states.get("pid", -1):
+                self.logger.debug(f"Not processing duplicated packet: {packet}")
+                raise BLEPacketAlreadyProcessed(f"BLE packet (pid={pid}) already processed!")
+            self.update_states(state_updates)
\ No newline at end of file
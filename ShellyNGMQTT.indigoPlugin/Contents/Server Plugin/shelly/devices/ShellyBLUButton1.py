@@ -36,7 +36,7 @@ class ShellyBLUButton1(ShellyBLU):
         state_updates.append({'key': "button", 'value': packet.get("button", -1)})
         state_updates.append({'key': "batteryLevel", 'value': packet.get("battery", 0)})
 
-        self.device.updateStatesOnServer(state_updates)
+        self.update_states(state_updates)
 
         # Fire any triggers matching this event for the device associated with the component
         button_code = packet.get("button")
@@ -52,4 +52,4 @@ class ShellyBLUDistance(ShellyBLU):
         else:
             state_updates.append({'key': "sensorValue", 'value': distance, 'uiValue': f"{distance} mm"})
 
-        self.device.updateStatesOnServer(state_updates)    
\ No newline at end of file
+        self.update_states(state_updates)    
\ No newline at end of file
@@ -41,7 +41,7 @@ class ShellyBLUDoorWindow(ShellyBLU):
         is_open = packet.get("window", 0) == 1
         state_updates.append({'key': "onOffState", 'value': is_open, "uiValue": "open" if is_open else "closed"})
 
-        self.device.updateStatesOnServer(state_updates)
+        self.update_states(state_updates)
 
-        self.device.updateStateImageOnServer(indigo.kStateImageSel.SensorTripped if is_open else indigo.kStateImageSel.SensorOff)
+        self.set_state_image(indigo.kStateImageSel.SensorTripped if is_open else indigo.kStateImageSel.SensorOff)
     
\ No newline at end of file
@@ -30,14 +30,12 @@ class ShellyPlusHT(Shelly):
             "ht-ui": HT_UI(self)
         }
 
-        props = self.device.pluginProps
-        props.update({
+        self.update_props(self.device, {
             "SupportsStatusRequest": False,
             "SupportsOnState": False,
             "SupportsSensorValue": False,
             "SupportsBatteryLevel": True
         })
-        self.device.replacePluginPropsOnServer(props)
 
         self.temperature = self.register_component(Temperature, "Temperature", comp_id=0)
         self.humidity = self.register_component(Humidity, "Humidity", comp_id=0)
@@ -112,17 +110,17 @@ class ShellyPlusHT(Shelly):
 
         :return: None
         """
-        if self.device.states["external-power"]:
-            self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryChargerOn)
+        if self.states.get("external-power", False):
+            self.set_state_image(indigo.kStateImageSel.BatteryChargerOn)
         else:
-            battery_level = self.device.batteryLevel or 0
+            battery_level = self.states.get("batteryLevel", None) or 0
             if battery_level > 75:
-                self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryLevelHigh)
+                self.set_state_image(indigo.kStateImageSel.BatteryLevelHigh)
             elif battery_level > 50:
-                self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryLevel75)
+                self.set_state_image(indigo.kStateImageSel.BatteryLevel75)
             elif battery_level > 25:
-                self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryLevel50)
+                self.set_state_image(indigo.kStateImageSel.BatteryLevel50)
             elif battery_level > 10:
-                self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryLevel25)
+                self.set_state_image(indigo.kStateImageSel.BatteryLevel25)
             else:
-                self.device.updateStateImageOnServer(indigo.kStateImageSel.BatteryLevelLow)
\ No newline at end of file
+                self.set_state_image(indigo.kStateImageSel.BatteryLevelLow)
\ No newline at end of file
@@ -0,0 +1,465 @@
+import json
+import logging
+import threading
+import time
+
+from collections import deque
+from queue import Empty
+
+from . import decoding
+from .status_map import METERING_KEYS, merge_status, status_conflicts
+
+# Queue policies for when a shard queue is full
+POLICY_BLOCK = "block"
+POLICY_LATEST_WINS = "latest-wins"
+
+# Results of making room in a full queue
+COALESCED = "coalesced"
+DROPPED = "dropped"
+
+_UNKNOWN = object()
+
+
+class ShardQueue(object):
+    """
+    A bounded queue of messages for a single worker.
+
+    When the queue is full the producer is blocked, unless the policy is
+    ``latest-wins``. In that case an incoming status message is merged into
+    the latest queued message of the same device if that is a status, with
+    newer values replacing older ones. Otherwise two adjacent queued status
+    messages of a device are merged to make room, and only as a last resort
+    a status message with nothing but measurements is dropped. Messages are
+    never merged past another message of the same device or when that would
+    lose a change (ex: the output turning on and off again). RPC responses,
+    events and other status changes are never dropped.
+    """
+
+    def __init__(self, max_size, policy, metrics):
+        """
+        Create a new shard queue.
+
+        :param max_size: The maximum number of queued messages.
+        :param policy: What to do when the queue is full.
+        :param metrics: The plugin metrics to record dropped messages in.
+        """
+
+        self.max_size = max(1, int(max_size))
+        self.policy = policy
+        self.metrics = metrics
+        self.items = deque()
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        """
+        Add a message to the queue, applying the queue policy when full.
+
+        :param item: A tuple of (shelly, topic_kind, payload), or None to stop the worker.
+        :return: None
+        """
+
+        with self.condition:
+            if item is None:
+                # The stop signal is never bounded
+                self.items.append(None)
+                self.condition.notify()
+                return
+
+            # [enqueued_at, shelly, topic_kind, payload, status]
+            entry = [time.monotonic(), item[0], item[1], item[2], _UNKNOWN]
+            while len(self.items) >= self.max_size:
+                if self.policy == POLICY_LATEST_WINS:
+                    result = self._make_room(entry)
+                    if result == COALESCED:
+                        return
+                    elif result == DROPPED:
+                        break
+                self.metrics.increment("message producer blocked")
+                self.condition.wait()
+
+            self.items.append(entry)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Remove the next message from the queue, waiting until one is available.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait forever.
+        :return: A tuple of (enqueued_at, shelly, topic_kind, payload), or None to stop the worker.
+        :raises Empty: If no message arrived within the timeout.
+        """
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items, timeout):
+                raise Empty
+            entry = self.items.popleft()
+            self.condition.notify()
+
+        if entry is None:
+            return None
+        return entry[0], entry[1], entry[2], entry[3]
+
+    def qsize(self):
+        """
+        The number of queued messages.
+
+        :return: The number of queued messages.
+        """
+
+        return len(self.items)
+
+    def oldest_age(self):
+        """
+        How long the oldest queued message has been waiting.
+
+        :return: The age in seconds, or 0 if the queue is empty.
+        """
+
+        with self.condition:
+            for entry in self.items:
+                if entry is not None:
+                    return time.monotonic() - entry[0]
+        return 0.0
+
+    def _make_room(self, entry):
+        """
+        Apply the latest-wins policy for an incoming message on a full queue.
+
+        Must be called while holding the condition.
+
+        :param entry: The incoming queue entry.
+        :return: ``COALESCED`` if the message was merged into a queued one,
+        ``DROPPED`` if room was made in the queue, otherwise None.
+        """
+
+        status = self._status(entry)
+        if status is not None:
+            # Merge into the latest queued message of the device if it is a
+            # status, so the status isn't processed before any other message
+            # of the device
+            for queued in reversed(self.items):
+                if queued is None or queued[1] is not entry[1]:
+                    continue
+                queued_status = self._status(queued)
+                if queued_status is not None and queued_status[0] == status[0] and not self._conflicts(queued_status, status):
+                    self._merge(queued, queued_status, status)
+                    self.metrics.increment("messages coalesced")
+                    return COALESCED
+                break
+
+        # Merge an older status of a device forward into the device's next
+        # message, if that is a status too
+        latest = {}
+        for index in range(len(self.items) - 1, -1, -1):
+            queued = self.items[index]
+            if queued is None:
+                continue
+            newer = latest.get(queued[1], None)
+            latest[queued[1]] = queued
+            queued_status = self._status(queued)
+            if newer is None or queued_status is None:
+                continue
+            newer_status = self._status(newer)
+            if newer_status is not None and newer_status[0] == queued_status[0] and not self._conflicts(queued_status, newer_status):
+                self._merge(newer, newer_status, queued_status, newer_wins=True)
+                del self.items[index]
+                self.metrics.increment("messages coalesced")
+                return DROPPED
+
+        for index, queued in enumerate(self.items):
+            if queued is not None and self._is_metering_only(queued):
+                del self.items[index]
+                self.metrics.increment("messages dropped")
+                return DROPPED
+
+        # Nothing can be merged or dropped without losing a change
+        return None
+
+    @staticmethod
+    def _conflicts(status, other_status):
+        """
+        Check if merging two status messages would lose a change, which is
+        when both set a value other than a measurement to different values
+        (ex: ``output`` turning on and then off again).
+
+        :param status: The decoded status of a message.
+        :param other_status: The decoded status of another message of the same kind.
+        :return: True if the messages must both be processed.
+        """
+
+        if status[0] == "online":
+            return status[1] != other_status[1]
+
+        params = status[1]['params']
+        for component, other in other_status[1]['params'].items():
+            if component == "ts" or component not in params:
+                continue
+            current = params[component]
+            if not isinstance(current, dict) or not isinstance(other, dict):
+                if current != other:
+                    return True
+                continue
+            if status_conflicts(current, other):
+                return True
+        return False
+
+    def _merge(self, target, target_status, other_status, newer_wins=False):
+        """
+        Merge the status of another message into a queued message.
+
+        Must be called while holding the condition.
+
+        :param target: The queue entry that keeps its place in the queue.
+        :param target_status: The decoded status of the target.
+        :param other_status: The decoded status of the other message.
+        :param newer_wins: True if the target is newer than the other message.
+        :return: None
+        """
+
+        kind, payload = target_status
+        if kind == "online":
+            # Merged online messages always have the same payload
+            return
+
+        if newer_wins:
+            # The other message is removed from the queue, so its params can be reused
+            params = merge_status(other_status[1]['params'], payload['params'])
+        else:
+            params = merge_status(payload['params'], other_status[1]['params'])
+        methods = (payload.get('method', None), other_status[1].get('method', None))
+        method = "NotifyFullStatus" if "NotifyFullStatus" in methods else "NotifyStatus"
+        rpc = dict(payload, method=method, params=params)
+        target[3] = json.dumps(rpc)
+        target[4] = ("status", rpc)
+
+    def _is_metering_only(self, entry):
+        """
+        Check if a message is a NotifyStatus that only reports measurements.
+
+        :param entry: A queue entry.
+        :return: True if the message can be dropped.
+        """
+
+        status = self._status(entry)
+        if status is None or status[0] != "status" or status[1].get('method', None) != "NotifyStatus":
+            return False
+        for component, component_status in status[1]['params'].items():
+            if component == "ts":
+                continue
+            if not isinstance(component_status, dict) or not METERING_KEYS.issuperset(component_status):
+                return False
+        return True
+
+    @staticmethod
+    def _status(entry):
+        """
+        Decode a status message, caching the result on the entry.
+
+        Only ``online`` messages and ``NotifyStatus``/``NotifyFullStatus``
+        events are status messages. The payload is only decoded here, which
+        is only reached when the queue is full.
+
+        :param entry: A queue entry.
+        :return: A tuple of ("online", payload) or ("status", rpc), or None if
+        the message is not a status message.
+        """
+
+        if entry[4] is not _UNKNOWN:
+            return entry[4]
+
+        status = None
+        topic_kind, payload = entry[2], entry[3]
+        if topic_kind == "online":
+            status = ("online", payload)
+        elif topic_kind == "events" and "Notify" in payload and "Status" in payload:
+            try:
+                rpc = decoding.loads(payload)
+            except ValueError:
+                rpc = {}
+            if rpc.get('method', None) in ("NotifyStatus", "NotifyFullStatus") and isinstance(rpc.get('params', None), dict):
+                status = ("status", rpc)
+
+        entry[4] = status
+        return status
+
+
+class MessageDispatcher(object):
+    """
+    Hands incoming messages to a pool of worker threads.
+
+    Messages are sharded by the Shelly's device id, so all messages for one
+    device are processed in order by the same worker while different devices
+    are processed in parallel.
+    """
+
+    def __init__(self, worker_count, metrics, queue_size=1000, queue_policy=POLICY_LATEST_WINS, after_batch=None):
+        """
+        Create a new dispatcher. Workers are not running until ``start`` is called.
+
+        :param worker_count: The number of worker threads (shards).
+        :param metrics: The plugin metrics to record processing times in.
+        :param queue_size: The maximum number of queued messages per worker.
+        :param queue_policy: What to do when a worker's queue is full.
+        :param after_batch: Optional function a worker calls when its queue runs empty.
+        """
+
+        self.worker_count = max(1, int(worker_count))
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.metrics = metrics
+        self.after_batch = after_batch
+        self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
+        self.shards = [ShardQueue(queue_size, queue_policy, metrics) for _ in range(self.worker_count)]
+        self.threads = []
+
+    def start(self):
+        """
+        Start a worker thread for every shard.
+
+        :return: None
+        """
+
+        for index, shard in enumerate(self.shards):
+            thread = threading.Thread(target=self._run, args=(shard,), name="ShellyNGMQTT-worker-{}".format(index), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the workers once they have processed every message already dispatched.
+
+        :param timeout: The maximum number of seconds to wait for each worker.
+        :return: None
+        """
+
+        for shard in self.shards:
+            shard.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def dispatch(self, shelly, topic_kind, payload):
+        """
+        Queue a message for the worker that owns the Shelly.
+
+        :param shelly: The Shelly object that should handle the message.
+        :param topic_kind: The kind of topic the message arrived on.
+        :param payload: The content of the message.
+        :return: None
+        """
+
+        self.shards[shelly.device_id % self.worker_count].put((shelly, topic_kind, payload))
+
+    def qsize(self):
+        """
+        The number of messages waiting across all shards.
+
+        :return: The number of queued messages.
+        """
+
+        return sum(shard.qsize() for shard in self.shards)
+
+    def oldest_age(self):
+        """
+        How long the oldest queued message across all shards has been waiting.
+
+        :return: The age in seconds.
+        """
+
+        return max(shard.oldest_age() for shard in self.shards)
+
+    def _run(self, shard):
+        """
+        Worker loop that processes messages from a single shard until stopped.
+
+        :param shard: The queue of messages for this worker.
+        :return: None
+        """
+
+        # Shellies owned by this worker with coalesced status or filtered states waiting to be flushed
+        pending_flush = {}
+        while True:
+            timeout = None
+            if pending_flush:
+                timeout = max(0.0, min(pending_flush.values()) - time.monotonic())
+
+            try:
+                item = shard.get(timeout)
+            except Empty:
+                item = False
+
+            if item is None:
+                # Don't lose any coalesced status when stopping
+                for shelly in pending_flush:
+                    self._flush_status(shelly)
+                self._after_batch()
+                return
+
+            if item:
+                enqueued_at, shelly, topic_kind, payload = item
+                started = time.monotonic()
+                self.metrics.observe("message worker wait", started - enqueued_at)
+                try:
+                    shelly.handle_message(topic_kind, payload)
+                except Exception:
+                    self.logger.exception("Error processing message for device id {}".format(shelly.device_id))
+                self.metrics.observe("message processing", time.monotonic() - started)
+
+                self._schedule_flush(pending_flush, shelly)
+
+            now = time.monotonic()
+            for shelly, due in list(pending_flush.items()):
+                if due <= now:
+                    del pending_flush[shelly]
+                    self._flush_status(shelly)
+                    self._schedule_flush(pending_flush, shelly)
+
+            if shard.qsize() == 0:
+                self._after_batch()
+
+    def _after_batch(self):
+        """
+        Call the after batch function, if any.
+
+        :return: None
+        """
+
+        if self.after_batch is None:
+            return
+        try:
+            self.after_batch()
+        except Exception:
+            self.logger.exception("Error after processing messages")
+
+    def _schedule_flush(self, pending_flush, shelly):
+        """
+        Track when a Shelly needs to be flushed next.
+
+        :param pending_flush: The flush deadlines of the worker, keyed by Shelly.
+        :param shelly: The Shelly that processed a message or was flushed.
+        :return: None
+        """
+
+        try:
+            due = shelly.next_flush_due()
+        except Exception:
+            self.logger.exception("Error processing status for device id {}".format(shelly.device_id))
+            due = None
+
+        if due is not None:
+            pending_flush[shelly] = due
+        else:
+            pending_flush.pop(shelly, None)
+
+    def _flush_status(self, shelly):
+        """
+        Process the coalesced status of a Shelly.
+
+        :param shelly: The Shelly to flush.
+        :return: None
+        """
+
+        try:
+            shelly.flush_status()
+        except Exception:
+            self.logger.exception("Error processing status for device id {}".format(shelly.device_id))
@@ -0,0 +1,246 @@
+import time
+
+# Groups of states filtered together, keyed by the prefix of their deadband
+# prop. The first state present in an update decides for the whole group so
+# related states (ex: °C and °F) are always written together.
+FILTER_GROUPS = {
+    'power': ("curEnergyLevel",),
+    'current': ("current",),
+    'voltage': ("voltage",),
+    'temperature': ("temperature_c", "temperature_f", "sensorValue"),
+}
+
+# Default number of seconds after which a value is written even if it is filtered
+DEFAULT_MAX_STALENESS = 300.0
+
+
+def parse_deadband(text):
+    """
+    Parse a deadband setting.
+
+    :param text: An absolute deadband (ex: "0.5") or a percent of the last value (ex: "5%").
+    :return: A tuple of the deadband and True if it is a percent, or None if it is not set or invalid.
+    """
+
+    text = str(text or "").strip()
+    percent = text.endswith("%")
+    if percent:
+        text = text[:-1].strip()
+    try:
+        deadband = float(text)
+    except ValueError:
+        return None
+    if deadband <= 0:
+        return None
+    return deadband, percent
+
+
+def parse_seconds(text, default=0.0):
+    """
+    Parse a number of seconds setting.
+
+    :param text: The setting.
+    :param default: The value to use when the setting is blank or invalid.
+    :return: The number of seconds.
+    """
+
+    try:
+        return max(0.0, float(text))
+    except (TypeError, ValueError):
+        return default
+
+
+class StateFilters(object):
+    """
+    Drops numeric state updates that are too small or too frequent to be
+    worth writing to Indigo.
+
+    An update of a filtered group is only passed when it moves further than
+    the group's deadband from the last passed value, and at least the minimum
+    interval has passed. Transitions to or from 0 always pass, and any change
+    passes once the last passed value is older than the maximum staleness.
+
+    The latest dropped update of each group is held and released by
+    ``release_due`` once it passes, since the device may not send another
+    update when the value stays the same.
+    """
+
+    def __init__(self, metrics, groups):
+        """
+        Create the filters for a component.
+
+        :param metrics: The plugin metrics to record filtered states in.
+        :param groups: The names of the ``FILTER_GROUPS`` the component reports.
+        """
+
+        self.metrics = metrics
+        self.groups = [(name, FILTER_GROUPS[name]) for name in groups]
+        self.config = None
+        self.deadbands = {}
+        self.min_interval = 0.0
+        self.max_staleness = DEFAULT_MAX_STALENESS
+        # group name -> (last passed value, time it passed)
+        self.last = {}
+        # group name -> the latest dropped state updates of the group
+        self.held = {}
+
+    def configure(self, props):
+        """
+        Apply the filter settings from a device's props, if they changed.
+
+        :param props: The plugin props of the component's device.
+        :return: None
+        """
+
+        config = tuple(props.get("{}-deadband".format(name), "") for name, _ in self.groups) + (
+            props.get("state-min-interval", ""),
+            props.get("state-max-staleness", ""),
+        )
+        if config == self.config:
+            return
+
+        self.config = config
+        self.deadbands = {}
+        for (name, _), text in zip(self.groups, config):
+            deadband = parse_deadband(text)
+            if deadband is not None:
+                self.deadbands[name] = deadband
+        self.min_interval = parse_seconds(config[-2])
+        self.max_staleness = parse_seconds(config[-1], DEFAULT_MAX_STALENESS)
+        self.last = {}
+
+    def apply(self, updated_states, now=None):
+        """
+        Remove the state updates that should not be written yet.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: The state updates to write.
+        """
+
+        if not self.deadbands and not self.min_interval:
+            return updated_states
+        if now is None:
+            now = time.monotonic()
+
+        values = {state['key']: state['value'] for state in updated_states}
+        dropped = set()
+        for name, keys in self.groups:
+            key = next((key for key in keys if key in values), None)
+            if key is None:
+                continue
+            value = values[key]
+            if self.passes(name, value, now):
+                self.record(name, value, now)
+                self.held.pop(name, None)
+            else:
+                dropped.update(keys)
+                self.held[name] = [state for state in updated_states if state['key'] in keys]
+
+        if not dropped:
+            return updated_states
+        filtered = [state for state in updated_states if state['key'] not in dropped]
+        self.metrics.increment("states filtered", len(updated_states) - len(filtered))
+        return filtered
+
+    def release_due(self, now=None):
+        """
+        Take the held state updates that should be written by now.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: The state updates to write.
+        """
+
+        if not self.held:
+            return []
+        if now is None:
+            now = time.monotonic()
+
+        released = []
+        for name, states in list(self.held.items()):
+            value = states[0]['value']
+            if self.passes(name, value, now):
+                self.record(name, value, now)
+                del self.held[name]
+                released.extend(states)
+
+        if released:
+            self.metrics.increment("filtered states released", len(released))
+        return released
+
+    def next_due(self, now=None):
+        """
+        When the next held state update may pass.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: The ``time.monotonic()`` to check the held updates at, or None if none can pass.
+        """
+
+        if not self.held:
+            return None
+        if now is None:
+            now = time.monotonic()
+
+        due = None
+        for name, states in self.held.items():
+            if self.passes(name, states[0]['value'], now):
+                return now
+            last_time = self.last[name][1]
+            if now < last_time + self.min_interval:
+                group_due = last_time + self.min_interval
+            elif self.max_staleness:
+                # Waiting for the deadband, which only the max staleness overrides
+                group_due = last_time + self.max_staleness
+            else:
+                continue
+            if due is None or group_due < due:
+                due = group_due
+        return due
+
+    def record(self, name, value, now):
+        """
+        Record the value of a group that passed.
+
+        :param name: The name of the group.
+        :param value: The value that passed.
+        :param now: The current ``time.monotonic()``.
+        :return: None
+        """
+
+        last = self.last.get(name, None)
+        if last is None or last[0] != value:
+            self.last[name] = (value, now)
+
+    def passes(self, name, value, now):
+        """
+        Check if a new value of a group should be written.
+
+        :param name: The name of the group.
+        :param value: The new value.
+        :param now: The current ``time.monotonic()``.
+        :return: True if the value should be written.
+        """
+
+        last = self.last.get(name, None)
+        if last is None or not isinstance(value, (int, float)) or not isinstance(last[0], (int, float)):
+            return True
+        last_value, last_time = last
+        if value == last_value:
+            # Unchanged values are dropped by the state shadow anyway
+            return True
+        if (value == 0) != (last_value == 0):
+            return True
+
+        elapsed = now - last_time
+        if self.max_staleness and elapsed >= self.max_staleness:
+            return True
+        if elapsed < self.min_interval:
+            return False
+
+        deadband = self.deadbands.get(name, None)
+        if deadband is None:
+            return True
+        threshold, percent = deadband
+        if percent:
+            threshold = abs(last_value) * threshold / 100
+        return abs(value - last_value) >= threshold
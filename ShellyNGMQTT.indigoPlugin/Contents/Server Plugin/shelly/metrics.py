@@ -0,0 +1,100 @@
+import threading
+
+
+class Timing(object):
+    """
+    Running summary of a measured duration (in seconds).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.last = 0.0
+
+    @property
+    def average(self):
+        """
+        The mean of all observed values.
+
+        :return: The average duration or 0 when nothing was observed.
+        """
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def observe(self, value):
+        """
+        Record a new measurement.
+
+        :param value: The measured duration in seconds.
+        :return: None
+        """
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.maximum:
+            self.maximum = value
+
+
+class Metrics(object):
+    """
+    Plugin-wide counters and timings that can be dumped to the log for diagnostics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timings = {}
+
+    def increment(self, name, amount=1):
+        """
+        Increment a named counter.
+
+        :param name: The name of the counter.
+        :param amount: The amount to add to the counter.
+        :return: None
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """
+        Record a measurement for a named timing.
+
+        :param name: The name of the timing.
+        :param value: The measured duration in seconds.
+        :return: None
+        """
+        with self._lock:
+            timing = self.timings.get(name, None)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.observe(value)
+
+    def reset(self):
+        """
+        Clear all counters and timings.
+
+        :return: None
+        """
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+
+    def log(self, logger):
+        """
+        Write all counters and timings to a logger.
+
+        :param logger: The logger to write to.
+        :return: None
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+
+        for name, value in counters:
+            logger.info("    {}: {}".format(name, value))
+        for name, timing in timings:
+            logger.info("    {}: count={} avg={:.1f} ms max={:.1f} ms last={:.1f} ms".format(
+                name, timing.count, timing.average * 1000, timing.maximum * 1000, timing.last * 1000))
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+
+from queue import Empty, Queue
+
+# The maximum number of messages sent in one batch
+PUBLISH_BATCH_SIZE = 100
+
+
+class Publisher(object):
+    """
+    Sends outgoing MQTT messages from a dedicated thread.
+
+    Callers (Indigo actions, message workers) only queue the message and
+    return immediately. The sender thread drains the queue in batches and
+    sends the messages for each broker back-to-back through the MQTT
+    Connector plugin.
+    """
+
+    def __init__(self, get_mqtt, metrics):
+        """
+        Create a new publisher. The sender is not running until ``start`` is called.
+
+        :param get_mqtt: Function returning the MQTT Connector plugin, or None if it is not enabled.
+        :param metrics: The plugin metrics to record publish times in.
+        """
+
+        self.get_mqtt = get_mqtt
+        self.metrics = metrics
+        self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
+        self.queue = Queue()
+        self.thread = None
+
+    def start(self):
+        """
+        Start the sender thread.
+
+        :return: None
+        """
+
+        self.thread = threading.Thread(target=self._run, name="ShellyNGMQTT-publisher", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the sender once every queued message was sent.
+
+        :param timeout: The maximum number of seconds to wait for the sender.
+        :return: None
+        """
+
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def publish(self, broker_id, topic, payload):
+        """
+        Queue a message to be published.
+
+        :param broker_id: The Indigo device id of the broker.
+        :param topic: The topic to send the message to.
+        :param payload: The content of the message.
+        :return: None
+        """
+
+        self.queue.put((time.monotonic(), broker_id, topic, payload))
+
+    def qsize(self):
+        """
+        The number of messages waiting to be sent.
+
+        :return: The number of queued messages.
+        """
+
+        return self.queue.qsize()
+
+    def _run(self):
+        """
+        Sender loop that publishes queued messages until stopped.
+
+        :return: None
+        """
+
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < PUBLISH_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                self._send(batch)
+            if stopping:
+                return
+
+    def _send(self, batch):
+        """
+        Publish a batch of messages, grouped by broker while keeping the order
+        of the messages for each broker.
+
+        :param batch: A list of (enqueued_at, broker_id, topic, payload).
+        :return: None
+        """
+
+        mqtt = self.get_mqtt()
+        if mqtt is None:
+            self.logger.error("MQTT plugin must be enabled! {} message(s) not sent".format(len(batch)))
+            self.metrics.increment("messages not published", len(batch))
+            return
+
+        brokers = {}
+        for message in batch:
+            brokers.setdefault(message[1], []).append(message)
+
+        for broker_id, messages in brokers.items():
+            for enqueued_at, _, topic, payload in messages:
+                self.metrics.observe("publish queue wait", time.monotonic() - enqueued_at)
+                props = {
+                    'topic': topic,
+                    'payload': payload,
+                    'qos': 0,
+                    'retain': 0,
+                }
+                try:
+                    mqtt.executeAction("publish", deviceId=broker_id, props=props, waitUntilDone=False)
+                except Exception:
+                    self.logger.exception("Unable to publish to \"{}\"".format(topic))
+                    continue
+                self.metrics.increment("messages published")
@@ -0,0 +1,286 @@
+import itertools
+import random
+import threading
+import time
+
+from collections import deque
+
+# Default number of seconds to wait for an RPC response
+RPC_TIMEOUT = 10.0
+# Default maximum number of RPCs waiting to be sent per device
+RPC_MAX_OUTSTANDING = 64
+# Default number of RPCs a device is sent before their responses arrive
+RPC_WINDOW = 3
+
+# Errors passed to callbacks, using the Shelly RPC error codes
+RPC_TIMEOUT_ERROR = {'code': -104, 'message': "Deadline exceeded"}
+RPC_EVICTED_ERROR = {'code': -108, 'message': "Too many outstanding requests"}
+
+# RPC ids are (session << 32) | counter. The random session lets responses to
+# requests from a previous plugin session be told apart, and the ids stay
+# below 2^53 so they are exact in the device's JavaScript numbers.
+RPC_SESSION = random.getrandbits(20) | 1
+_rpc_counter = itertools.count(1)
+
+
+def next_rpc_id():
+    """
+    Generate the id for a new RPC.
+
+    :return: An id that is unique within the plugin session.
+    """
+
+    return (RPC_SESSION << 32) | (next(_rpc_counter) & 0xFFFFFFFF)
+
+
+def is_session_rpc_id(rpc_id):
+    """
+    Check if an RPC id was generated in this plugin session.
+
+    :param rpc_id: The id from an RPC response.
+    :return: True if the id belongs to this session.
+    """
+
+    return type(rpc_id) is int and rpc_id >> 32 == RPC_SESSION
+
+
+class RpcError(Exception):
+    """An RPC returned an error or did not receive a response in time."""
+
+    def __init__(self, error):
+        """
+        :param error: The error object from the RPC response.
+        """
+        self.code = error.get('code', None)
+        self.message = error.get('message', "<Unknown>")
+        super(RpcError, self).__init__("{} ({})".format(self.message, self.code))
+
+
+class SingleFlight(object):
+    """
+    Shares a single request between identical calls made while it is in flight.
+
+    The first caller for a key sends the request. Callers that arrive before
+    it finishes only add their callback, and every callback receives the
+    response when ``finish`` is called.
+    """
+
+    def __init__(self, metrics):
+        """
+        :param metrics: The plugin metrics to record the saved requests in.
+        """
+
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        # key -> callbacks waiting on the in-flight request
+        self.calls = {}
+
+    def join(self, key, callback):
+        """
+        Add a callback for a request.
+
+        :param key: A hashable key identifying identical requests.
+        :param callback: The callback for the response.
+        :return: True if an identical request is in flight and the callback
+        joined it, False if the caller must send the request.
+        """
+
+        with self.lock:
+            callbacks = self.calls.get(key, None)
+            if callbacks is None:
+                self.calls[key] = [callback]
+                return False
+            callbacks.append(callback)
+        self.metrics.increment("rpc calls saved")
+        return True
+
+    def finish(self, key):
+        """
+        Stop sharing a request that received its response.
+
+        :param key: The key of the request.
+        :return: The callbacks that should receive the response.
+        """
+
+        with self.lock:
+            return self.calls.pop(key, [])
+
+
+class RpcManager(object):
+    """
+    Tracks the RPCs that are waiting for a response from a device.
+
+    Gen2 devices only handle a few RPCs at once, so at most ``window`` calls
+    are in flight. Further calls wait in a queue and are sent as responses
+    arrive. Every sent call gets a deadline. Calls that are not answered in
+    time are expired by ``expire`` so their callback learns about the failure
+    instead of waiting forever. The number of queued calls is capped, and the
+    oldest queued call with a callback is failed when a new one would exceed
+    the cap. Calls without a callback (commands) are only dropped when no
+    queued call has a callback.
+    """
+
+    def __init__(self, metrics, send, timeout=RPC_TIMEOUT, max_outstanding=RPC_MAX_OUTSTANDING, window=RPC_WINDOW):
+        """
+        Create a new RPC manager.
+
+        :param metrics: The plugin metrics to record timeouts in.
+        :param send: The function to call with a message to send it to the device.
+        :param timeout: The default number of seconds to wait for a response.
+        :param max_outstanding: The maximum number of calls waiting to be sent.
+        :param window: The maximum number of calls in flight at once.
+        """
+
+        self.metrics = metrics
+        self.send = send
+        self.timeout = timeout
+        self.max_outstanding = max_outstanding
+        self.window = window
+        self.lock = threading.Lock()
+        # rpc_id -> (deadline, callback), oldest first
+        self.outstanding = {}
+        # (rpc_id, message, callback, timeout) waiting for room in the window
+        self.waiting = deque()
+        self.sweep_requested = False
+
+    def __len__(self):
+        return len(self.outstanding) + len(self.waiting)
+
+    @property
+    def queue_depth(self):
+        """
+        The number of calls waiting for room in the window.
+
+        :return: The number of queued calls.
+        """
+        return len(self.waiting)
+
+    def submit(self, rpc_id, message, callback=None, timeout=None):
+        """
+        Send an RPC if the window has room, otherwise queue it.
+
+        :param rpc_id: The id of the RPC.
+        :param message: The message to pass to ``send``.
+        :param callback: Optional function to call with (result, error).
+        :param timeout: Seconds to wait for the response once sent, or None for the default.
+        :return: A list of (message, callback) tuples of the calls evicted to
+        stay under the cap. The caller must call each callback with
+        ``RPC_EVICTED_ERROR``, and report calls without a callback as dropped.
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+
+        evicted = []
+        send_now = False
+        with self.lock:
+            if len(self.outstanding) < self.window and not self.waiting:
+                self.outstanding[rpc_id] = (time.monotonic() + timeout, callback)
+                send_now = True
+            else:
+                while len(self.waiting) >= self.max_outstanding:
+                    evicted.append(self._evict())
+                self.waiting.append((rpc_id, message, callback, timeout))
+
+        if send_now:
+            self.send(message)
+        else:
+            self.metrics.increment("rpc queued")
+
+        if evicted:
+            self.metrics.increment("rpc evicted", len(evicted))
+        return evicted
+
+    def _evict(self):
+        """
+        Remove the oldest queued call that has a callback, or the oldest call
+        if none has one.
+
+        Must be called while holding the lock.
+
+        :return: The (message, callback) of the removed call.
+        """
+
+        for index, (_, message, callback, _) in enumerate(self.waiting):
+            if callback is not None:
+                del self.waiting[index]
+                return message, callback
+        _, message, callback, _ = self.waiting.popleft()
+        return message, callback
+
+    def resolve(self, rpc_id):
+        """
+        Stop tracking an RPC that received a response, sending the next queued call.
+
+        :param rpc_id: The id of the RPC.
+        :return: The callback for the RPC, or None if it is unknown, already
+        expired, or was sent without a callback.
+        """
+
+        with self.lock:
+            entry = self.outstanding.pop(rpc_id, None)
+            messages = self._fill_window()
+        for message in messages:
+            self.send(message)
+
+        if entry is None:
+            return None
+        return entry[1]
+
+    def _fill_window(self):
+        """
+        Move queued calls into the window while there is room.
+
+        Must be called while holding the lock.
+
+        :return: The messages that need to be sent.
+        """
+
+        messages = []
+        while self.waiting and len(self.outstanding) < self.window:
+            rpc_id, message, callback, timeout = self.waiting.popleft()
+            # The deadline starts when the call is actually sent
+            self.outstanding[rpc_id] = (time.monotonic() + timeout, callback)
+            messages.append(message)
+        return messages
+
+    def is_sweep_due(self, now):
+        """
+        Check if any outstanding RPC has passed its deadline and no sweep was requested yet.
+
+        :param now: The current ``time.monotonic()``.
+        :return: True if ``expire`` should be called.
+        """
+
+        if self.sweep_requested:
+            return False
+        with self.lock:
+            for deadline, _ in self.outstanding.values():
+                if deadline <= now:
+                    self.sweep_requested = True
+                    return True
+        return False
+
+    def expire(self, now=None):
+        """
+        Stop tracking every RPC that passed its deadline.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: A list of expired callbacks, which must be called with
+        ``RPC_TIMEOUT_ERROR`` by the caller.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            self.sweep_requested = False
+            expired_ids = [rpc_id for rpc_id, (deadline, _) in self.outstanding.items() if deadline <= now]
+            expired = [self.outstanding.pop(rpc_id)[1] for rpc_id in expired_ids]
+            messages = self._fill_window()
+        for message in messages:
+            self.send(message)
+
+        if expired:
+            self.metrics.increment("rpc timeouts", len(expired))
+        return [callback for callback in expired if callback is not None]
@@ -0,0 +1,94 @@
+import threading
+
+
+class StateShadow(object):
+    """
+    A copy of the states last written to an Indigo device.
+
+    Reading ``device.states`` fetches the whole device from the Indigo
+    server, so the states are only read once and then kept up to date with
+    every write made through ``diff``. Writes that change neither the value
+    nor how it is shown (uiValue, decimalPlaces) are dropped. A device can be updated from several threads (message
+    workers, actions), so the shadow is locked.
+    """
+
+    def __init__(self, get_device, metrics):
+        """
+        Create a new state shadow. The device states are read on first use.
+
+        :param get_device: Function returning the Indigo device.
+        :param metrics: The plugin metrics to record written and suppressed states in.
+        """
+
+        self.get_device = get_device
+        self.metrics = metrics
+        self.lock = threading.RLock()
+        self.values = None
+        # key -> (uiValue, decimalPlaces) last written. Not readable from the
+        # device, so a state is written once before its format is known.
+        self.formats = {}
+
+    def load(self):
+        """
+        Get the shadow values, reading the device states the first time.
+
+        :return: A dict of state key to value.
+        """
+
+        with self.lock:
+            if self.values is None:
+                self.values = dict(self.get_device().states)
+                self.formats = {}
+            return self.values
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def get(self, key, default=None):
+        """
+        Get the last known value of a state.
+
+        :param key: The state key.
+        :param default: The value to return when the device has no such state.
+        :return: The value of the state.
+        """
+
+        return self.load().get(key, default)
+
+    def diff(self, updated_states):
+        """
+        Determine which state updates change a value or its format, recording them as written.
+
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: The state updates that changed a value or its format.
+        """
+
+        changed = []
+        with self.lock:
+            values = self.load()
+            for state in updated_states:
+                key = state['key']
+                value = state['value']
+                state_format = (state.get('uiValue', None), state.get('decimalPlaces', None))
+                if key in values and values[key] == value and type(values[key]) is type(value) \
+                        and self.formats.get(key, (None, None)) == state_format:
+                    continue
+                values[key] = value
+                self.formats[key] = state_format
+                changed.append(state)
+
+        if changed:
+            self.metrics.increment("states written", len(changed))
+        if len(changed) < len(updated_states):
+            self.metrics.increment("states suppressed", len(updated_states) - len(changed))
+        return changed
+
+    def invalidate(self):
+        """
+        Forget the shadow values so the device states are read again on next use.
+
+        :return: None
+        """
+
+        with self.lock:
+            self.values = None
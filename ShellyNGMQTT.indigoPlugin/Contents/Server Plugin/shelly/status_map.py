@@ -0,0 +1,187 @@
+# coding=utf-8
+
+# Component status keys that only report measurements. Merging a newer
+# measurement into an older status loses nothing.
+METERING_KEYS = frozenset((
+    "id", "apower", "voltage", "current", "pf", "freq", "aenergy", "ret_aenergy", "temperature",
+))
+
+# Compiled extractors, keyed by (component class, state keys the device has)
+_compiled = {}
+
+
+def merge_status(status, update):
+    """
+    Merge a status update into an existing status, recursing into nested
+    objects so partial updates (ex: only ``aenergy.total``) are preserved.
+
+    :param status: The status to merge into.
+    :param update: The newer status values.
+    :return: The merged status.
+    """
+
+    for key, value in update.items():
+        existing = status.get(key, None)
+        if isinstance(value, dict) and isinstance(existing, dict):
+            merge_status(existing, value)
+        else:
+            status[key] = value
+    return status
+
+
+def status_conflicts(status, update):
+    """
+    Check if merging a component status update would lose a change, which is
+    when both set a value other than a measurement to different values
+    (ex: ``output`` turning on and then off again).
+
+    :param status: The older status of a component.
+    :param update: The newer status of the same component.
+    :return: True if both must be processed.
+    """
+
+    for key, value in update.items():
+        if key not in METERING_KEYS and key in status and status[key] != value:
+            return True
+    return False
+
+
+def changes_only_metering(status, update):
+    """
+    Check if merging a component status update only changes measurements.
+
+    :param status: The older status of a component, or None if there is none.
+    :param update: The newer status of the same component.
+    :return: True if the update can be merged without delaying a change.
+    """
+
+    if status is None:
+        return METERING_KEYS.issuperset(update)
+    if status_conflicts(status, update):
+        return False
+    return all(key in METERING_KEYS or key in status for key in update)
+
+
+def unit(symbol):
+    """
+    Build a formatter that shows a value followed by its unit.
+
+    :param symbol: The unit, ex: "W".
+    :return: A function formatting a value for the uiValue of a state.
+    """
+
+    template = "{} " + symbol
+    return template.format
+
+
+def kwh(value):
+    """
+    Format an energy total in watt-hours as kilowatt-hours.
+
+    :param value: The energy in Wh.
+    :return: The uiValue of the state.
+    """
+
+    return "{:.3f} kWh".format(value / 1000)
+
+
+class StatusField(object):
+    """
+    Maps a value in a component status to an Indigo device state.
+
+    The field is only extracted for devices that have the state, which is
+    how optional capabilities (ex: power metering) are declared in the
+    device state list.
+    """
+
+    def __init__(self, path, key, formatter=None):
+        """
+        Declare a status field.
+
+        :param path: The keys leading to the value in the status, ex: "temperature.tC".
+        :param key: The Indigo state key to write the value to.
+        :param formatter: Optional function formatting the value for the uiValue of the state.
+        """
+
+        self.path = tuple(path.split("."))
+        self.key = key
+        self.formatter = formatter
+
+
+class StatusExtractor(object):
+    """
+    Extracts the state updates of a list of status fields, compiled for the
+    states one device actually has.
+    """
+
+    def __init__(self, fields):
+        """
+        Create an extractor.
+
+        :param fields: The ``StatusField`` objects to extract.
+        """
+
+        # Fields grouped by the first key of their path, so each nested
+        # object (ex: "temperature") is only looked up once
+        groups = {}
+        for field in fields:
+            groups.setdefault(field.path[0], []).append((field.path[1:], field.key, field.formatter))
+        self.groups = tuple((name, tuple(entries)) for name, entries in groups.items())
+
+    def extract(self, status):
+        """
+        Build the state updates for the fields present in a status.
+
+        :param status: The status of the component.
+        :return: A list of state update dicts, each with a key and value.
+        """
+
+        updated_states = []
+        for name, entries in self.groups:
+            group_value = status.get(name, None)
+            if group_value is None:
+                continue
+            for path, key, formatter in entries:
+                value = group_value
+                for part in path:
+                    value = value.get(part, None) if isinstance(value, dict) else None
+                if value is None:
+                    continue
+                if formatter is None:
+                    updated_states.append({'key': key, 'value': value})
+                else:
+                    updated_states.append({'key': key, 'value': value, 'uiValue': formatter(value)})
+        return updated_states
+
+
+# The temperature and power metering fields of an output (Switch, Light)
+OUTPUT_STATUS_FIELDS = (
+    StatusField("temperature.tC", "temperature_c", unit("°C")),
+    StatusField("temperature.tF", "temperature_f", unit("°F")),
+    StatusField("apower", "curEnergyLevel", unit("W")),
+    StatusField("voltage", "voltage", unit("V")),
+    StatusField("current", "current", unit("A")),
+    StatusField("pf", "power_factor"),
+    StatusField("aenergy.total", "accumEnergyTotal", kwh),
+)
+
+
+def compile_status_fields(component_class, states):
+    """
+    Get the extractor for the status fields of a component class, limited to
+    the states a device has. Extractors are shared by every device with the
+    same states.
+
+    :param component_class: The component class declaring ``status_fields``.
+    :param states: The state keys of the device.
+    :return: A ``StatusExtractor``.
+    """
+
+    fields = component_class.status_fields
+    available = frozenset(field.key for field in fields if field.key in states)
+    cache_key = (component_class, available)
+    extractor = _compiled.get(cache_key, None)
+    if extractor is None:
+        extractor = StatusExtractor([field for field in fields if field.key in available])
+        _compiled[cache_key] = extractor
+    return extractor
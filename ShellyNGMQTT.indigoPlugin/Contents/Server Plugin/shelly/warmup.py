@@ -0,0 +1,142 @@
+import logging
+import random
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class WarmupScheduler(object):
+    """
+    Spreads the initial config and status RPCs of started devices over time.
+
+    When Indigo starts the plugin every device is started back-to-back, and
+    fetching every device at once floods the broker. Devices are instead
+    released at most ``rate`` per second, with some jitter so devices on the
+    same broker don't stay in lockstep. A device counts as online once its
+    status was received (or failed), and the time until every scheduled
+    device is online is logged.
+    """
+
+    def __init__(self, rate, metrics, jitter=0.5):
+        """
+        Create a new warm-up scheduler.
+
+        :param rate: The maximum number of devices released per second, 0 for no limit.
+        :param metrics: The plugin metrics to record the warm-up time in.
+        :param jitter: The fraction by which the interval between devices is randomized.
+        """
+
+        self.rate = rate
+        self.jitter = jitter
+        self.metrics = metrics
+        self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
+        self.lock = threading.Lock()
+        # device_id -> shelly, in the order they were scheduled
+        self.waiting = OrderedDict()
+        # Device ids released and waiting for their status
+        self.warming = set()
+        self.next_release = 0.0
+        self.started_at = 0.0
+        self.device_count = 0
+        self.failed_count = 0
+
+    def schedule(self, shelly):
+        """
+        Queue a started device to be warmed up.
+
+        :param shelly: The Shelly to warm up.
+        :return: None
+        """
+
+        with self.lock:
+            if not self.waiting and not self.warming:
+                # Start timing a new batch of devices
+                self.started_at = time.monotonic()
+                self.device_count = 0
+                self.failed_count = 0
+            if shelly.device_id not in self.waiting:
+                self.device_count += 1
+            self.waiting[shelly.device_id] = shelly
+
+    def cancel(self, device_id):
+        """
+        Stop warming up a device that was stopped.
+
+        :param device_id: The Indigo device id of the Shelly.
+        :return: None
+        """
+
+        with self.lock:
+            if self.waiting.pop(device_id, None) is not None:
+                self.device_count -= 1
+        self.complete(device_id)
+
+    def time_until_next(self, now=None):
+        """
+        How long until the next device can be released.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: The number of seconds, or None if no device is waiting.
+        """
+
+        if not self.waiting:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self.next_release - now)
+
+    def release_due(self, now=None):
+        """
+        Take the devices that may be warmed up now, within the rate limit.
+
+        :param now: The current ``time.monotonic()``, or None to read the clock.
+        :return: A list of Shellies to send the warm-up RPCs to.
+        """
+
+        if not self.waiting:
+            return []
+        if now is None:
+            now = time.monotonic()
+
+        due = []
+        with self.lock:
+            while self.waiting and self.next_release <= now:
+                device_id, shelly = self.waiting.popitem(last=False)
+                self.warming.add(device_id)
+                due.append(shelly)
+                if self.rate > 0:
+                    interval = random.uniform(1 - self.jitter, 1 + self.jitter) / self.rate
+                    self.next_release = max(self.next_release, now) + interval
+        return due
+
+    def complete(self, device_id, success=True):
+        """
+        Record that a released device received its status, logging the total
+        time once every scheduled device is online.
+
+        :param device_id: The Indigo device id of the Shelly.
+        :param success: False if the status could not be fetched.
+        :return: None
+        """
+
+        with self.lock:
+            if device_id not in self.warming:
+                return
+            self.warming.discard(device_id)
+            if not success:
+                self.failed_count += 1
+            if self.waiting or self.warming:
+                return
+            elapsed = time.monotonic() - self.started_at
+            device_count = self.device_count
+            failed_count = self.failed_count
+
+        self.metrics.observe("device warm-up", elapsed)
+        message = "{} device(s) online after {:.1f} s".format(device_count, elapsed)
+        if failed_count:
+            message += " ({} did not respond)".format(failed_count)
+        if device_count > 1:
+            self.logger.info(message)
+        else:
+            self.logger.debug(message)
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+
+
+class WriteBuffer(object):
+    """
+    Collects state and state image updates for Indigo devices so each device
+    gets at most one ``updateStatesOnServer`` and one
+    ``updateStateImageOnServer`` per flush.
+
+    A single message often updates the same device from several components
+    (ex: the temperature, humidity and battery of a Plus H&T), and each of
+    those writes would otherwise be a separate round trip to the server.
+    """
+
+    def __init__(self, get_device, metrics):
+        """
+        Create a new write buffer.
+
+        :param get_device: Function returning the Indigo device for a device id.
+        :param metrics: The plugin metrics to record server calls in.
+        """
+
+        self.get_device = get_device
+        self.metrics = metrics
+        self.logger = logging.getLogger("Plugin.ShellyNGMQTT")
+        self.lock = threading.Lock()
+        # Held while writing, so an older flush can't overwrite a newer one
+        self.flush_lock = threading.Lock()
+        # device_id -> {state key: state update}
+        self.states = {}
+        # device_id -> state image
+        self.images = {}
+        # device_id -> the state image last written
+        self.written_images = {}
+
+    def stage_states(self, device_id, updated_states):
+        """
+        Stage state updates for a device, replacing staged updates of the same states.
+
+        :param device_id: The Indigo device id.
+        :param updated_states: A list of state update dicts, each with a key and value.
+        :return: None
+        """
+
+        with self.lock:
+            staged = self.states.setdefault(device_id, {})
+            for state in updated_states:
+                staged[state['key']] = state
+
+    def stage_image(self, device_id, image):
+        """
+        Stage the state image for a device.
+
+        :param device_id: The Indigo device id.
+        :param image: The ``indigo.kStateImageSel`` to show.
+        :return: None
+        """
+
+        with self.lock:
+            self.images[device_id] = image
+
+    def forget(self, device_id):
+        """
+        Forget the state image last written to a device, so it is written again.
+
+        :param device_id: The Indigo device id.
+        :return: None
+        """
+
+        with self.lock:
+            self.written_images.pop(device_id, None)
+
+    def flush(self):
+        """
+        Write all staged updates to the Indigo server.
+
+        :return: None
+        """
+
+        if not self.states and not self.images:
+            return
+        with self.flush_lock:
+            self._flush()
+
+    def _flush(self):
+        """
+        Take the staged updates and write them. Must be called while holding the flush lock.
+
+        :return: None
+        """
+
+        with self.lock:
+            if not self.states and not self.images:
+                return
+            states, self.states = self.states, {}
+            images, self.images = self.images, {}
+            for device_id, image in list(images.items()):
+                if self.written_images.get(device_id, None) == image:
+                    del images[device_id]
+                    self.metrics.increment("state images suppressed")
+                else:
+                    self.written_images[device_id] = image
+
+        started = time.monotonic()
+        server_calls = 0
+        for device_id in set(states) | set(images):
+            device = self.get_device(device_id)
+            if device is None:
+                continue
+
+            try:
+                if device_id in states:
+                    device.updateStatesOnServer(list(states[device_id].values()))
+                    server_calls += 1
+                if device_id in images:
+                    device.updateStateImageOnServer(images[device_id])
+                    server_calls += 1
+            except Exception:
+                self.logger.exception("Unable to update the states of device id {}".format(device_id))
+
+        self.metrics.increment("write buffer flushes")
+        self.metrics.increment("write buffer server calls", server_calls)
+        self.metrics.observe("write buffer flush", time.monotonic() - started)
@@ -0,0 +1,247 @@
+import logging
+import os
+import sys
+import types
+
+from collections import deque
+
+import pytest
+
+# The plugin code is not a package, Indigo runs it from the Server Plugin folder
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ShellyNGMQTT.indigoPlugin", "Contents", "Server Plugin"))
+
+from shelly.metrics import Metrics  # noqa: E402
+from shelly.writes import WriteBuffer  # noqa: E402
+
+
+class FakeDevice(object):
+    """
+    Stand-in for an Indigo device, counting the writes to the server.
+    """
+
+    def __init__(self, dev_id, name="Shelly", props=None, states=None, device_type_id=""):
+        self.id = dev_id
+        self.name = name
+        self.model = ""
+        self.deviceTypeId = device_type_id
+        self.group = dev_id
+        self._props = dict(props or {})
+        self.states = dict(states or {})
+        self.props_writes = []
+        self.image_writes = []
+        self.props_reads = 0
+        self.server_refreshes = 0
+
+    @property
+    def pluginProps(self):
+        # Indigo hands out a copy of the props
+        self.props_reads += 1
+        return dict(self._props)
+
+    def replacePluginPropsOnServer(self, props):
+        self._props = dict(props)
+        self.props_writes.append(dict(props))
+
+    def updateStatesOnServer(self, states):
+        self.states.update((state['key'], state['value']) for state in states)
+
+    def updateStateImageOnServer(self, image):
+        self.image_writes.append(image)
+
+    def replaceOnServer(self):
+        self.server_refreshes += 1
+
+    def stateListOrDisplayStateIdChanged(self):
+        self.server_refreshes += 1
+
+
+class FakePlugin(object):
+    """
+    Stand-in for the running plugin, holding the plugin-wide objects used by devices.
+    """
+
+    pluginVersion = "1.0.0"
+
+    def __init__(self):
+        self.metrics = Metrics()
+        self.devices = {}
+        self.pluginPrefs = {}
+        self.triggers = {}
+        self.status_coalesce_window = 0.0
+        self.write_buffer = WriteBuffer(self.get_device, self.metrics)
+
+    def get_device(self, dev_id):
+        return self.devices.get(dev_id, None)
+
+    def create_device(self, name, deviceTypeId, groupWithDevice):
+        return create_device(name=name, deviceTypeId=deviceTypeId, groupWithDevice=groupWithDevice)
+
+
+def create_device(name, deviceTypeId, groupWithDevice):
+    """
+    Fake ``indigo.device.create``, adding the device to ``indigo.devices``.
+    """
+
+    devices = sys.modules["indigo"].devices
+    device = FakeDevice(max(devices) + 1, name=name, device_type_id=deviceTypeId)
+    device.group = devices[groupWithDevice].group
+    devices[device.id] = device
+    return device
+
+
+def get_group_list(device):
+    """
+    Fake ``indigo.device.getGroupList``.
+    """
+
+    devices = sys.modules["indigo"].devices
+    return [dev_id for dev_id, grouped in devices.items() if grouped.group == device.group]
+
+
+class FakeMqttConnector(object):
+    """
+    Stand-in for the MQTT Connector plugin, counting its actions.
+    """
+
+    def __init__(self):
+        # (broker id, message type) -> messages waiting to be fetched
+        self.queued = {}
+        self.published = []
+        self.fetches = 0
+
+    def isEnabled(self):
+        return True
+
+    def queue(self, broker_id, message_type, topic, payload):
+        message = {'topic_parts': topic.split("/"), 'payload': payload, 'message_type': message_type}
+        self.queued.setdefault((broker_id, message_type), deque()).append(message)
+
+    def executeAction(self, action, deviceId=None, props=None, waitUntilDone=True):
+        if action == "fetchQueuedMessage":
+            self.fetches += 1
+            messages = self.queued.get((deviceId, props['message_type']), None)
+            return messages.popleft() if messages else None
+        if action == "publish":
+            self.published.append((deviceId, props['topic'], props['payload']))
+        return None
+
+
+class FakePluginBase(object):
+    """
+    Stand-in for ``indigo.PluginBase``.
+    """
+
+    class StopThread(Exception):
+        pass
+
+    def __init__(self, pluginId, pluginDisplayName, pluginVersion, pluginPrefs):
+        self.pluginId = pluginId
+        self.pluginDisplayName = pluginDisplayName
+        self.pluginVersion = pluginVersion
+        self.pluginPrefs = pluginPrefs
+        self.pluginFolderPath = ""
+        self.logger = logging.getLogger("Plugin")
+        self.indigo_log_handler = logging.NullHandler()
+
+    def deviceUpdated(self, orig_dev, new_dev):
+        pass
+
+    def deviceDeleted(self, device):
+        pass
+
+    def getDeviceStateList(self, device):
+        return []
+
+    def _state_dict(self, state_type):
+        return lambda key, trigger_label, control_page_label: {'Key': key, 'Type': state_type}
+
+    def __getattr__(self, name):
+        # getDeviceStateDictForNumberType and friends
+        if name.startswith("getDeviceStateDictFor"):
+            return self._state_dict(name[len("getDeviceStateDictFor"):])
+        raise AttributeError(name)
+
+    def getDeviceDisplayStateId(self, device):
+        return None
+
+
+def start_shelly(plugin, dev_id, address, device_type_id="shelly-plus-1", broker_id=10):
+    """
+    Create a main Shelly device and start it the way Indigo does.
+    """
+
+    props = {'broker-id': str(broker_id), 'address': address, 'message-type': "shelly"}
+    device = FakeDevice(dev_id, name=address, props=props, device_type_id=device_type_id)
+    sys.modules["indigo"].devices[dev_id] = device
+    plugin.deviceStartComm(device)
+    return plugin.shellies[dev_id]
+
+
+class FakeEnum(object):
+    """
+    Stand-in for an Indigo enum, ex: ``indigo.kStateImageSel.NoImage == "NoImage"``.
+    """
+
+    def __getattr__(self, name):
+        return name
+
+
+def install_fake_indigo():
+    """
+    Install a minimal ``indigo`` module when not running inside Indigo.
+    """
+
+    if "indigo" in sys.modules:
+        return sys.modules["indigo"]
+
+    indigo = types.ModuleType("indigo")
+    indigo.kStateImageSel = FakeEnum()
+    indigo.kProtocol = types.SimpleNamespace(Plugin="Plugin")
+    indigo.device = types.SimpleNamespace(
+        getGroupList=get_group_list,
+        create=lambda protocol, **kwargs: create_device(**kwargs),
+        changeDeviceTypeId=lambda device, device_type_id: device,
+    )
+    indigo.devices = {}
+    indigo.activePlugin = None
+    indigo.PluginBase = FakePluginBase
+    indigo.mqtt_connector = None
+    indigo.server = types.SimpleNamespace(
+        getPlugin=lambda plugin_id: indigo.mqtt_connector,
+        subscribeToBroadcast=lambda plugin_id, message, handler: None,
+    )
+    sys.modules["indigo"] = indigo
+    return indigo
+
+
+install_fake_indigo()
+
+
+@pytest.fixture
+def plugin():
+    indigo = sys.modules["indigo"]
+    indigo.activePlugin = FakePlugin()
+    indigo.devices = indigo.activePlugin.devices
+    yield indigo.activePlugin
+    indigo.activePlugin = None
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def indigo_plugin():
+    """
+    The real plugin, connected to a fake MQTT Connector (``indigo_plugin.mqtt_plugin``).
+    """
+
+    indigo = sys.modules["indigo"]
+    indigo.mqtt_connector = FakeMqttConnector()
+    indigo.devices = {}
+    from plugin import Plugin
+    indigo.activePlugin = Plugin("com.example.shellyngmqtt", "Shelly NG MQTT", "1.0.0", {'log-level': "warning"})
+    yield indigo.activePlugin
+    indigo.activePlugin = None
+    indigo.mqtt_connector = None
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from conftest import FakeDevice
+
+from shelly.devices.ShellyBLU import BLEPacketAlreadyProcessed, ShellyBLU
+
+
+def test_packet_relayed_twice_is_processed_once(plugin):
+    plugin.devices[1] = FakeDevice(1, states={'pid': -1})
+    shelly_blu = ShellyBLU(1)
+    update_states = shelly_blu.update_states
+
+    def slow_update_states(updated_states):
+        # Widen the window between the duplicate check and the pid update
+        time.sleep(0.05)
+        update_states(updated_states)
+
+    shelly_blu.update_states = slow_update_states
+    processed = []
+
+    def relay():
+        try:
+            shelly_blu.process_packet({'pid': 7, 'address': "aa:bb:cc:dd:ee:ff"})
+            processed.append(True)
+        except BLEPacketAlreadyProcessed:
+            pass
+
+    threads = [threading.Thread(target=relay) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert processed == [True]
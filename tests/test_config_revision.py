@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import FakeDevice
+
+from shelly.components.functional.switch import Switch
+from shelly.components.system.system import System
+from shelly.devices.Shelly import Shelly
+
+
+def make_shelly(plugin, monkeypatch):
+    plugin.devices[1] = FakeDevice(1)
+    shelly = Shelly(1)
+    shelly.system_components = {"system": System(shelly)}
+    calls = []
+    monkeypatch.setattr(shelly, "publish_rpc", lambda method, params=None, callback=None, timeout=None: calls.append((method, callback)))
+    return shelly, calls
+
+
+def test_config_changed_stores_revision_once_config_is_processed(plugin, monkeypatch):
+    shelly, calls = make_shelly(plugin, monkeypatch)
+    system = shelly.get_component(component_type="sys")
+
+    system.handle_notify_event({'name': "config_changed", 'cfg_rev': 5})
+    assert [method for method, _ in calls] == ["Shelly.GetConfig"]
+    assert 'cfg-rev' not in shelly.device.pluginProps
+
+    calls[0][1]({'sys': {'device': {'name': "Kitchen"}}})
+    assert shelly.device.pluginProps['cfg-rev'] == "5"
+    assert shelly.cfg_rev == 5
+
+    # The same revision reported again is already current
+    system.handle_notify_event({'name': "config_changed", 'cfg_rev': 5})
+    assert len(calls) == 1
+
+
+def test_failed_config_fetch_is_fetched_again(plugin, monkeypatch):
+    shelly, calls = make_shelly(plugin, monkeypatch)
+    system = shelly.get_component(component_type="sys")
+
+    system.handle_notify_event({'name': "config_changed", 'cfg_rev': 5})
+    calls[0][1](None, {'code': -104, 'message': "Timeout"})
+    assert 'cfg-rev' not in shelly.device.pluginProps
+    assert shelly.cfg_rev is None
+
+    shelly.check_config_revision(5)
+    assert len(calls) == 2
+
+
+def test_failed_config_processing_is_fetched_again(plugin, monkeypatch):
+    shelly, calls = make_shelly(plugin, monkeypatch)
+
+    def fail(data, method_name):
+        raise ValueError("bad config")
+
+    shelly.check_config_revision(5)
+    monkeypatch.setattr(shelly, "route_component_data", fail)
+    with pytest.raises(ValueError):
+        calls[0][1]({'sys': {}})
+    assert shelly.cfg_rev is None
+
+
+def test_created_component_device_forces_config_fetch(plugin, monkeypatch):
+    props = {'cfg-rev': "5", 'cfg-rev-version': plugin.pluginVersion}
+    plugin.devices[1] = FakeDevice(1, props=props)
+    shelly = Shelly(1)
+    assert shelly.cfg_rev == 5
+
+    shelly.register_component(Switch, "Switch")
+    calls = []
+    monkeypatch.setattr(shelly, "publish_rpc", lambda method, params=None, callback=None, timeout=None: calls.append(method))
+    shelly.check_config_revision(5)
+    assert calls == ["Shelly.GetConfig"]
+
+
+def test_existing_component_device_keeps_config_revision(plugin, monkeypatch):
+    props = {'cfg-rev': "5", 'cfg-rev-version': plugin.pluginVersion}
+    plugin.devices[1] = FakeDevice(1, props=props)
+    switch_device = plugin.create_device(name="Shelly Switch", deviceTypeId=Switch.device_type_id, groupWithDevice=1)
+    switch_device.model = "Switch"
+    shelly = Shelly(1)
+
+    shelly.register_component(Switch, "Switch")
+    calls = []
+    monkeypatch.setattr(shelly, "publish_rpc", lambda method, params=None, callback=None, timeout=None: calls.append(method))
+    shelly.check_config_revision(5)
+    assert calls == []
@@ -0,0 +1,82 @@
+import json
+import timeit
+
+from conftest import start_shelly
+
+from shelly import decoding
+
+
+def notify_status(src, params):
+    return json.dumps({'src': src, 'dst': src + "/events", 'method': "NotifyStatus", 'params': dict({'ts': 1700000000.12}, **params)})
+
+
+# A minute of status updates from a Pro 4PM, as components and connections report them
+PRO_4PM = "shellypro4pm-a8032ab12345"
+PRO_4PM_TRACE = [
+    notify_status(PRO_4PM, {"switch:{}".format(n % 4): {'id': n % 4, 'apower': 8.9 + n, 'voltage': 237.5, 'current': 0.068}})
+    for n in range(12)
+] + [
+    notify_status(PRO_4PM, {'cloud': {'connected': n % 2 == 0}}) for n in range(4)
+] + [
+    notify_status(PRO_4PM, {'ws': {'connected': True}}),
+    notify_status(PRO_4PM, {'eth': {'ip': "10.0.0.20"}}),
+    notify_status(PRO_4PM, {'sys': {'uptime': 3600, 'ram_free': 150000}}),
+]
+# A Plus H&T waking up
+PLUS_HT = "shellyplusht-a8032ab12345"
+PLUS_HT_TRACE = [
+    notify_status(PLUS_HT, {'temperature:0': {'id': 0, 'tC': 21.5, 'tF': 70.7}}),
+    notify_status(PLUS_HT, {'humidity:0': {'id': 0, 'rh': 45.2}}),
+    notify_status(PLUS_HT, {'devicepower:0': {'id': 0, 'battery': {'V': 5.5, 'percent': 80}}}),
+    notify_status(PLUS_HT, {'cloud': {'connected': True}}),
+    notify_status(PLUS_HT, {'ws': {'connected': True}}),
+]
+
+
+def test_status_for_unused_components_is_not_decoded(indigo_plugin, monkeypatch):
+    pro = start_shelly(indigo_plugin, 1000, PRO_4PM, "shelly-pro-4-pm")
+    ht = start_shelly(indigo_plugin, 2000, PLUS_HT, "shelly-plus-ht")
+    temperature = ht.get_component(component_type="temperature")
+    temperature.device.replacePluginPropsOnServer(dict(temperature.device.pluginProps, unit="C"))
+    decoded = []
+    monkeypatch.setattr(decoding, "loads", lambda payload: decoded.append(payload) or json.loads(payload))
+
+    for shelly, trace in ((pro, PRO_4PM_TRACE), (ht, PLUS_HT_TRACE)):
+        for payload in trace:
+            shelly.handle_message("events", payload)
+
+    # Only cloud, ws and eth (the Ethernet component is registered as "ethernet") are skipped
+    assert len(decoded) == 12 + 1 + 3
+    assert indigo_plugin.metrics.counters["status messages skipped"] == 6 + 2
+    assert all('"cloud"' not in payload and '"ws"' not in payload for payload in decoded)
+
+
+def test_nested_keys_named_like_a_component_are_decoded(indigo_plugin):
+    pro = start_shelly(indigo_plugin, 1000, PRO_4PM, "shelly-pro-4-pm")
+    # "sys" only appears nested, the payload is decoded to be sure
+    assert pro.status_scanner.may_concern(notify_status(PRO_4PM, {'cloud': {'sys': {'connected': True}}}))
+    assert not pro.status_scanner.may_concern(notify_status(PRO_4PM, {'cloud': {'connected': True}}))
+
+
+class DecodeEverything(object):
+    def may_concern(self, payload):
+        return True
+
+
+def test_skipping_is_cheaper_than_decoding(indigo_plugin):
+    pro = start_shelly(indigo_plugin, 1000, PRO_4PM, "shelly-pro-4-pm")
+    skipped = [payload for payload in PRO_4PM_TRACE if not pro.status_scanner.may_concern(payload)]
+    scanner = pro.status_scanner
+
+    def handle():
+        for payload in skipped:
+            pro.handle_message("events", payload)
+
+    scan_times, decode_times = [], []
+    # Alternate the runs so a busy moment slows both down
+    for _ in range(7):
+        pro._status_scanner = scanner
+        scan_times.append(timeit.timeit(handle, number=200))
+        pro._status_scanner = DecodeEverything()
+        decode_times.append(timeit.timeit(handle, number=200))
+    assert min(scan_times) < min(decode_times)
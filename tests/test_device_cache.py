@@ -0,0 +1,59 @@
+import os
+import sys
+
+from conftest import FakeDevice, start_shelly
+
+TRACE = os.path.join(os.path.dirname(__file__), "traces", "shellyplus1pm_status.jsonl")
+
+
+class CountingDevices(dict):
+    """
+    ``indigo.devices``, counting the devices fetched from the server.
+    """
+
+    fetches = 0
+
+    def get(self, dev_id, default=None):
+        self.fetches += 1
+        return super(CountingDevices, self).get(dev_id, default)
+
+    def __getitem__(self, dev_id):
+        self.fetches += 1
+        return super(CountingDevices, self).__getitem__(dev_id)
+
+
+def test_indigo_api_calls_per_message(indigo_plugin):
+    indigo = sys.modules["indigo"]
+    indigo.devices = CountingDevices()
+    indigo_plugin.status_coalesce_window = 0.0
+    shelly = start_shelly(indigo_plugin, 1000, "shellyplus1pm-a8032ab12345", "shelly-plus-1-pm")
+    for device in list(indigo.devices.values()):
+        indigo_plugin.deviceStartComm(device)
+    switch = shelly.get_component(component_type="switch")
+
+    with open(TRACE) as trace:
+        messages = trace.read().splitlines() * 13
+    indigo.devices.fetches = 0
+    for message in messages:
+        shelly.handle_message("events", message)
+        indigo_plugin.write_buffer.flush()
+
+    # The 1,001 messages only write the states that changed
+    assert len(messages) == 1001
+    assert indigo.devices.fetches == 0
+    assert "indigo device fetches" not in indigo_plugin.metrics.counters
+    assert indigo_plugin.metrics.counters["write buffer server calls"] < len(messages)
+    assert switch.device.states['onOffState'] is False
+
+
+def test_updated_devices_replace_the_cached_device(indigo_plugin):
+    shelly = start_shelly(indigo_plugin, 1000, "shellyplus1pm-a8032ab12345", "shelly-plus-1-pm")
+    updated = FakeDevice(1000, name="Kitchen", props=shelly.device.pluginProps)
+
+    indigo_plugin.deviceUpdated(shelly.device, updated)
+    assert shelly.device is updated
+
+    # Devices that are not started are fetched from the server
+    indigo_plugin.deviceStopComm(updated)
+    assert indigo_plugin.get_device(1000) is sys.modules["indigo"].devices[1000]
+    assert indigo_plugin.metrics.counters["indigo device fetches"] == 1
@@ -0,0 +1,116 @@
+import json
+import time
+
+from shelly.dispatcher import MessageDispatcher, ShardQueue, POLICY_LATEST_WINS
+
+
+def notify_status(params):
+    return json.dumps({'method': "NotifyStatus", 'params': params})
+
+
+def queued_params(queue):
+    return [json.loads(entry[3]).get('params', None) for entry in queue.items]
+
+
+def test_latest_wins_merges_into_latest_status(metrics):
+    shelly = object()
+    queue = ShardQueue(2, POLICY_LATEST_WINS, metrics)
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': True}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'apower': 5.0}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'apower': 6.0}})))
+
+    assert queued_params(queue) == [
+        {'switch:0': {'output': True}},
+        {'switch:0': {'apower': 6.0}},
+    ]
+
+
+def test_latest_wins_keeps_order_with_rpc_responses(metrics):
+    shelly = object()
+    other = object()
+    queue = ShardQueue(3, POLICY_LATEST_WINS, metrics)
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': True, 'apower': 5.0}})))
+    queue.put((shelly, "rpc", json.dumps({'id': 1})))
+    queue.put((other, "events", notify_status({'switch:0': {'apower': 1.0}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'apower': 6.0}})))
+
+    # The newer status stays behind the RPC response instead of being merged before it
+    assert queued_params(queue) == [
+        {'switch:0': {'output': True, 'apower': 5.0}},
+        None,
+        {'switch:0': {'apower': 6.0}},
+    ]
+
+
+def test_latest_wins_merges_status_after_rpc_response(metrics):
+    shelly = object()
+    queue = ShardQueue(2, POLICY_LATEST_WINS, metrics)
+    queue.put((shelly, "rpc", json.dumps({'id': 1})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': True}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'apower': 6.0}})))
+
+    assert queued_params(queue) == [
+        None,
+        {'switch:0': {'output': True, 'apower': 6.0}},
+    ]
+
+
+def test_latest_wins_never_merges_away_a_change(metrics):
+    shelly = object()
+    other = object()
+    queue = ShardQueue(3, POLICY_LATEST_WINS, metrics)
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': True}})))
+    queue.put((other, "events", notify_status({'switch:0': {'apower': 5.0}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': False}})))
+    queue.put((shelly, "events", notify_status({'switch:0': {'output': True}})))
+
+    # The output changes can't be merged, so the status with only measurements is dropped
+    assert queued_params(queue) == [
+        {'switch:0': {'output': True}},
+        {'switch:0': {'output': False}},
+        {'switch:0': {'output': True}},
+    ]
+    assert metrics.counters["messages dropped"] == 1
+
+
+class SlowShelly(object):
+    """
+    A device whose messages wait on a simulated Indigo server round trip.
+    """
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.handled = []
+
+    def handle_message(self, topic_kind, payload):
+        time.sleep(0.002)
+        self.handled.append(payload)
+
+    def next_flush_due(self):
+        return None
+
+    def flush_status(self):
+        pass
+
+
+def process_all(worker_count, metrics):
+    shellies = [SlowShelly(device_id) for device_id in range(1, 33)]
+    dispatcher = MessageDispatcher(worker_count, metrics)
+    dispatcher.start()
+    started = time.monotonic()
+    for index in range(10):
+        for shelly in shellies:
+            dispatcher.dispatch(shelly, "rpc", index)
+    dispatcher.stop(timeout=30)
+    elapsed = time.monotonic() - started
+
+    for shelly in shellies:
+        assert shelly.handled == list(range(10))
+    return elapsed
+
+
+def test_workers_scale_with_slow_indigo_calls(metrics):
+    single = process_all(1, metrics)
+    eight = process_all(8, metrics)
+
+    assert eight * 3 < single
@@ -0,0 +1,38 @@
+from shelly.filters import StateFilters
+
+
+def power(value):
+    return [{'key': "curEnergyLevel", 'value': value}]
+
+
+def test_dropped_step_is_written_after_min_interval(metrics):
+    filters = StateFilters(metrics, ("power",))
+    filters.configure({'state-min-interval': "10"})
+
+    assert filters.apply(power(100), now=0) == power(100)
+    assert filters.apply(power(200), now=1) == []
+    assert filters.next_due(now=1) == 10
+    assert filters.release_due(now=5) == []
+    assert filters.release_due(now=10) == power(200)
+    assert filters.next_due(now=10) is None
+
+
+def test_value_within_deadband_is_written_after_max_staleness(metrics):
+    filters = StateFilters(metrics, ("power",))
+    filters.configure({'power-deadband': "50", 'state-max-staleness': "300"})
+
+    assert filters.apply(power(100), now=0) == power(100)
+    assert filters.apply(power(110), now=1) == []
+    assert filters.next_due(now=1) == 300
+    assert filters.release_due(now=299) == []
+    assert filters.release_due(now=300) == power(110)
+
+
+def test_newer_value_replaces_held_value(metrics):
+    filters = StateFilters(metrics, ("power",))
+    filters.configure({'state-min-interval': "10"})
+
+    filters.apply(power(100), now=0)
+    filters.apply(power(200), now=1)
+    assert filters.apply(power(100), now=2) == power(100)
+    assert filters.release_due(now=10) == []
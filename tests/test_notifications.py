@@ -0,0 +1,51 @@
+BROKER_ID = 10
+
+
+def notify(plugin, count):
+    for _ in range(count):
+        plugin.message_handler({'message_type': "shelly", 'brokerID': str(BROKER_ID)})
+
+
+def test_fetch_calls_per_thousand_messages(indigo_plugin):
+    connector = indigo_plugin.mqtt_plugin
+    indigo_plugin.register_message_type(1, "shelly")
+
+    # 1,000 messages arriving in bursts of 100, each drained by the message thread
+    for burst in range(10):
+        for _ in range(100):
+            connector.queue(BROKER_ID, "shelly", "shellyplus1-a8032ab12345/events/rpc", "{}")
+        notify(indigo_plugin, 100)
+        indigo_plugin.process_messages(timeout=0)
+
+    counters = indigo_plugin.metrics.counters
+    assert counters["messages fetched"] == 1000
+    assert counters["notifications coalesced"] == 990
+    # One fetch per message plus the empty fetch ending each drain, instead
+    # of at least one empty fetch per notification
+    assert connector.fetches == 1010
+
+
+def test_notification_during_a_drain_fetches_again(indigo_plugin):
+    connector = indigo_plugin.mqtt_plugin
+    indigo_plugin.register_message_type(1, "shelly")
+    fetch = connector.executeAction
+
+    def fetch_and_notify(action, **kwargs):
+        if connector.fetches == 0:
+            # A message arriving while the first drain is running
+            connector.queue(BROKER_ID, "shelly", "shellyplus1-a8032ab12345/online", "true")
+            notify(indigo_plugin, 1)
+        return fetch(action, **kwargs)
+
+    connector.executeAction = fetch_and_notify
+    connector.queue(BROKER_ID, "shelly", "shellyplus1-a8032ab12345/online", "true")
+    notify(indigo_plugin, 1)
+    indigo_plugin.process_messages(timeout=0)
+
+    assert indigo_plugin.metrics.counters["messages fetched"] == 2
+    assert indigo_plugin.pending_fetches == set()
+
+
+def test_unused_message_types_are_not_fetched(indigo_plugin):
+    notify(indigo_plugin, 5)
+    assert indigo_plugin.message_queue.empty()
@@ -0,0 +1,47 @@
+from conftest import FakeDevice
+
+from shelly.components.system.ble import BLE
+from shelly.components.system.ht_ui import HT_UI
+from shelly.components.system.system import System
+from shelly.components.system.wifi import WiFi
+from shelly.devices.Shelly import Shelly
+
+GET_CONFIG = {
+    'sys': {
+        'device': {'name': "Bathroom", 'mac': "AABBCCDDEEFF", 'fw_id': "20230912-082001/1.0.3-g6176478", 'eco_mode': False},
+        'location': {'tz': "Europe/Berlin", 'lat': 52.5, 'lon': 13.4},
+        'debug': {'mqtt': {'enable': False}, 'websocket': {'enable': False}, 'udp': {'addr': None}},
+    },
+    'wifi': {
+        'ap': {'ssid': "ShellyPlusHT-AABBCCDDEEFF", 'is_open': True, 'enable': False},
+        'sta': {'ssid': "Home", 'is_open': False, 'enable': True, 'ipv4mode': "dhcp"},
+        'sta1': {'ssid': None, 'is_open': True, 'enable': False, 'ipv4mode': "dhcp"},
+        'roam': {'rssi_thr': -80, 'interval': 60},
+    },
+    'ble': {'enable': True},
+    'ht_ui': {'temperature_unit': "C"},
+}
+
+
+def test_full_config_writes_main_device_props_once(plugin):
+    device = plugin.devices[1] = FakeDevice(1)
+    shelly = Shelly(1)
+    shelly.system_components = {
+        "system": System(shelly),
+        "wifi": WiFi(shelly),
+        "ble": BLE(shelly),
+        "ht-ui": HT_UI(shelly),
+    }
+
+    shelly.process_full_config(GET_CONFIG, cfg_rev=7)
+    assert len(device.props_writes) == 1
+    props = device.props_writes[0]
+    assert props['system-device-name'] == "Bathroom"
+    assert props['wifi-1-ssid'] == "Home"
+    assert props['ble-enable'] is True
+    assert props['temperature-unit'] == "C"
+    assert props['cfg-rev'] == "7"
+
+    # Nothing changed, so nothing is written
+    shelly.process_full_config(GET_CONFIG, cfg_rev=7)
+    assert len(device.props_writes) == 1
@@ -0,0 +1,45 @@
+import time
+
+from conftest import FakeMqttConnector
+
+from shelly.publisher import Publisher
+
+
+class SlowConnector(FakeMqttConnector):
+    """
+    An MQTT Connector taking a few milliseconds per action, like a round trip to another plugin.
+    """
+
+    def executeAction(self, action, deviceId=None, props=None, waitUntilDone=True):
+        time.sleep(0.005)
+        return super(SlowConnector, self).executeAction(action, deviceId, props, waitUntilDone)
+
+
+def test_scene_is_published_without_waiting_for_the_connector(metrics):
+    connector = SlowConnector()
+    publisher = Publisher(lambda: connector, metrics)
+    publisher.start()
+
+    # A scene switching 20 devices on two brokers
+    started = time.perf_counter()
+    for n in range(20):
+        publisher.publish(10 + n % 2, "shellyplus1-{}/rpc".format(n), '{"method": "Switch.Set"}')
+        publisher.publish(10 + n % 2, "shellyplus1-{}/rpc".format(n), '{"method": "Switch.GetStatus"}')
+    queued = time.perf_counter() - started
+    publisher.stop()
+
+    # Sending the 40 messages takes at least 0.2 s, queueing them does not
+    assert queued < 0.1
+    assert len(connector.published) == 40
+    for broker_id in (10, 11):
+        topics = [topic for published_broker, topic, _ in connector.published if published_broker == broker_id]
+        assert topics == [topic for n in range(broker_id - 10, 20, 2) for topic in ["shellyplus1-{}/rpc".format(n)] * 2]
+    assert metrics.counters["messages published"] == 40
+
+
+def test_messages_are_dropped_when_the_connector_is_disabled(metrics):
+    publisher = Publisher(lambda: None, metrics)
+    publisher.start()
+    publisher.publish(10, "shellyplus1-0/rpc", "{}")
+    publisher.stop()
+    assert metrics.counters["messages not published"] == 1
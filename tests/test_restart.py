@@ -0,0 +1,69 @@
+import sys
+
+import pytest
+
+from conftest import start_shelly
+
+
+@pytest.fixture
+def refreshed(monkeypatch):
+    """
+    The ids of the devices refreshed on the Indigo server, in order.
+    """
+
+    device_api = sys.modules["indigo"].device
+    refreshed = []
+
+    def change_device_type_id(device, device_type_id):
+        refreshed.append(device.id)
+        return device
+
+    monkeypatch.setattr(device_api, "changeDeviceTypeId", change_device_type_id)
+    return refreshed
+
+
+def server_calls(devices):
+    return sum(device.server_refreshes + len(device.props_writes) for device in devices.values())
+
+
+def start_plus_1pms(plugin, count):
+    devices = sys.modules["indigo"].devices
+    for n in range(count):
+        start_shelly(plugin, 1000 + n * 10, "shellyplus1pm-{}".format(n), "shelly-plus-1-pm")
+    # Indigo starts the component devices too
+    for device in list(devices.values()):
+        plugin.deviceStartComm(device)
+    return devices
+
+
+def restart(plugin, devices):
+    for device in list(devices.values()):
+        plugin.deviceStopComm(device)
+    for device in list(devices.values()):
+        plugin.deviceStartComm(device)
+
+
+def test_restart_skips_the_device_refresh(indigo_plugin, refreshed):
+    devices = start_plus_1pms(indigo_plugin, 20)
+    assert sorted(refreshed) == sorted(devices)
+    first_start = server_calls(devices)
+
+    del refreshed[:]
+    restart(indigo_plugin, devices)
+    assert refreshed == []
+    assert indigo_plugin.metrics.counters["device refreshes skipped"] == len(devices)
+    # Only the props the Shellies force on their component devices are written again
+    assert server_calls(devices) - first_start == 2 * 20
+
+
+def test_plugin_upgrade_refreshes_every_device_once(indigo_plugin, refreshed):
+    devices = start_plus_1pms(indigo_plugin, 5)
+
+    del refreshed[:]
+    indigo_plugin.pluginVersion = "1.1.0"
+    restart(indigo_plugin, devices)
+    assert sorted(refreshed) == sorted(devices)
+
+    del refreshed[:]
+    restart(indigo_plugin, devices)
+    assert refreshed == []
@@ -0,0 +1,109 @@
+import timeit
+
+from conftest import start_shelly
+
+BROKER_ID = 10
+TOPIC_KINDS = {"online": "online", "rpc": "rpc", "events/rpc": "events"}
+
+
+class RecordingDispatcher(object):
+    def __init__(self):
+        self.dispatched = []
+
+    def dispatch(self, shelly, topic_kind, payload):
+        self.dispatched.append((shelly.device_id, topic_kind))
+
+
+def start_devices(plugin, count):
+    shellies = []
+    for n in range(count):
+        # Leave room for the component devices created with each Shelly
+        shellies.append(start_shelly(plugin, 1000 + n * 10, "shellies/plus1-{}".format(n), broker_id=BROKER_ID))
+    return shellies
+
+
+def queue_messages(connector, count, device_count):
+    topics = list(TOPIC_KINDS)
+    for n in range(count):
+        if n % 10 == 9:
+            # A device the plugin does not know
+            topic = "shellies/other/events/rpc"
+        else:
+            topic = "shellies/plus1-{}/{}".format(n % device_count, topics[n % 3])
+        connector.queue(BROKER_ID, "shelly", topic, "{}")
+
+
+def legacy_routes(plugin, shellies):
+    """
+    The routing done before the routing table: device ids by topic string,
+    and the message type read from the device of each listening Shelly.
+    """
+
+    device_topics = {}
+    for shelly in shellies:
+        for topic in shelly.get_topics():
+            device_topics.setdefault(topic, []).append(shelly.device_id)
+
+    def route(data):
+        topic = '/'.join(data['topic_parts'])
+        for dev_id in device_topics.get(topic, list()):
+            shelly = plugin.shellies.get(dev_id, None)
+            if shelly is not None and data['message_type'] == shelly.get_message_type():
+                yield shelly, TOPIC_KINDS[topic[len(shelly.get_address()) + 1:]]
+    return route
+
+
+def table_routes(plugin):
+    """
+    The lookup ``process_messages`` makes in the routing table.
+    """
+
+    def route(data):
+        for message_type, shelly, topic_kind in plugin.topic_routes.get((BROKER_ID, tuple(data['topic_parts'])), ()):
+            if data['message_type'] == message_type:
+                yield shelly, topic_kind
+    return route
+
+
+def test_routing_ten_thousand_messages(indigo_plugin):
+    shellies = start_devices(indigo_plugin, 100)
+    # Only count the reads made to route messages, not to warm up devices
+    for shelly in shellies:
+        indigo_plugin.warmup.cancel(shelly.device_id)
+    props_reads = sum(shelly.device.props_reads for shelly in shellies)
+
+    indigo_plugin.dispatcher = RecordingDispatcher()
+    queue_messages(indigo_plugin.mqtt_plugin, 10000, len(shellies))
+    indigo_plugin.message_handler({'message_type': "shelly", 'brokerID': str(BROKER_ID)})
+    indigo_plugin.process_messages(timeout=0)
+
+    assert indigo_plugin.metrics.counters["messages fetched"] == 10000
+    assert len(indigo_plugin.dispatcher.dispatched) == 9000
+    assert indigo_plugin.dispatcher.dispatched[:3] == [(1000, "online"), (1010, "rpc"), (1020, "events")]
+    # No device is read to route a message, where the topic strings read one per message
+    assert sum(shelly.device.props_reads for shelly in shellies) == props_reads
+
+
+def test_route_lookup_is_faster_than_topic_strings(indigo_plugin):
+    shellies = start_devices(indigo_plugin, 100)
+    queue_messages(indigo_plugin.mqtt_plugin, 10000, len(shellies))
+    messages = list(indigo_plugin.mqtt_plugin.queued[(BROKER_ID, "shelly")])
+    legacy = legacy_routes(indigo_plugin, shellies)
+    table = table_routes(indigo_plugin)
+
+    def route_all(route):
+        return [(shelly.device_id, topic_kind) for data in messages for shelly, topic_kind in route(data)]
+
+    assert route_all(table) == route_all(legacy)
+    table_times, legacy_times = [], []
+    # Alternate the runs so a busy moment slows both down
+    for _ in range(7):
+        table_times.append(timeit.timeit(lambda: route_all(table), number=1))
+        legacy_times.append(timeit.timeit(lambda: route_all(legacy), number=1))
+    assert min(table_times) < min(legacy_times)
+
+
+def test_stopped_device_is_no_longer_routed(indigo_plugin):
+    shellies = start_devices(indigo_plugin, 2)
+    indigo_plugin.deviceStopComm(shellies[0].device)
+    assert [route[1] for routes in indigo_plugin.topic_routes.values() for route in routes] == [shellies[1]] * 3
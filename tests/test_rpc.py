@@ -0,0 +1,215 @@
+import json
+import random
+import threading
+import time
+import timeit
+import uuid
+
+from collections import deque
+
+from conftest import FakeDevice
+
+from shelly.devices.Shelly import Shelly
+from shelly.rpc import RpcManager, RPC_EVICTED_ERROR, RPC_SESSION, RPC_TIMEOUT_ERROR, is_session_rpc_id, next_rpc_id
+
+
+class LossyDevice(object):
+    """
+    A simulated device that answers the RPCs it receives, except for a share of lost replies.
+    """
+
+    def __init__(self, loss, seed=1):
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.received = deque()
+        self.lost = 0
+
+    def send(self, rpc_id):
+        self.received.append(rpc_id)
+
+    def reply(self, manager):
+        while self.received:
+            rpc_id = self.received.popleft()
+            if self.random.random() < self.loss:
+                self.lost += 1
+                continue
+            callback = manager.resolve(rpc_id)
+            if callback:
+                callback({'id': rpc_id}, None)
+
+
+def test_every_callback_completes_when_replies_are_lost(metrics):
+    device = LossyDevice(loss=0.1)
+    manager = RpcManager(metrics, device.send, timeout=10.0, max_outstanding=16, window=3)
+    outcomes = {}
+
+    def make_callback(rpc_id):
+        return lambda result, error=None: outcomes.setdefault(rpc_id, []).append((result, error))
+
+    for burst in range(50):
+        # More calls than the device answers between bursts, so some are evicted
+        for rpc_id in range(burst * 20, (burst + 1) * 20):
+            for _, callback in manager.submit(rpc_id, rpc_id, make_callback(rpc_id)):
+                callback(None, RPC_EVICTED_ERROR)
+        device.reply(manager)
+        for callback in manager.expire(time.monotonic() + 60):
+            callback(None, RPC_TIMEOUT_ERROR)
+
+    while len(manager):
+        device.reply(manager)
+        for callback in manager.expire(time.monotonic() + 60):
+            callback(None, RPC_TIMEOUT_ERROR)
+
+    assert sorted(outcomes) == list(range(1000))
+    for rpc_id, calls in outcomes.items():
+        assert len(calls) == 1
+        result, error = calls[0]
+        if error is None:
+            assert result == {'id': rpc_id}
+        else:
+            assert error['code'] in (-104, -108)
+
+    errors = [calls[0][1]['code'] for calls in outcomes.values() if calls[0][1] is not None]
+    assert errors.count(-104) == device.lost
+    assert -108 in errors
+    assert manager.outstanding == {}
+    assert len(manager.waiting) == 0
+
+
+def test_commands_are_only_evicted_after_calls_with_callbacks(metrics):
+    manager = RpcManager(metrics, lambda message: None, max_outstanding=2, window=1)
+    failed = []
+
+    manager.submit(0, "Shelly.GetStatus", lambda result, error=None: None)
+    manager.submit(1, "Switch.Set")
+    manager.submit(2, "Shelly.GetConfig", failed.append)
+    evicted = manager.submit(3, "Switch.Toggle")
+    assert evicted == [("Shelly.GetConfig", failed.append)]
+    assert [message for _, message, _, _ in manager.waiting] == ["Switch.Set", "Switch.Toggle"]
+
+    # With only commands queued the oldest one is dropped
+    assert manager.submit(4, "Switch.Set") == [("Switch.Set", None)]
+
+
+def make_shelly(plugin, monkeypatch):
+    plugin.devices[1] = FakeDevice(1, props={'address': "shellyplus1-a8032ab12345"})
+    shelly = Shelly(1)
+    sent = []
+    monkeypatch.setattr(shelly.rpc, "send", lambda payload: sent.append(json.loads(payload)))
+    return shelly, sent
+
+
+def respond(shelly, rpc, result=None, error=None):
+    response = {'id': rpc['id'], 'src': "shellyplus1-a8032ab12345", 'dst': rpc['src']}
+    if error is None:
+        response['result'] = result
+    else:
+        response['error'] = error
+    shelly.handle_message("rpc", json.dumps(response))
+
+
+def test_identical_reads_share_one_response(plugin, monkeypatch):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+    responses = []
+
+    for caller in range(3):
+        shelly.publish_rpc("Shelly.GetConfig", callback=lambda result, error=None, caller=caller: responses.append((caller, result, error)))
+    assert len(sent) == 1
+    assert plugin.metrics.counters["rpc calls saved"] == 2
+
+    respond(shelly, sent[0], result={'sys': {}})
+    assert responses == [(0, {'sys': {}}, None), (1, {'sys': {}}, None), (2, {'sys': {}}, None)]
+
+
+def test_shared_read_passes_errors_and_timeouts_to_every_caller(plugin, monkeypatch):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+    errors = []
+
+    for _ in range(2):
+        shelly.publish_rpc("Shelly.GetStatus", callback=lambda result, error=None: errors.append(error))
+    respond(shelly, sent[0], error={'code': -103, 'message': "Invalid argument"})
+    assert errors == [{'code': -103, 'message': "Invalid argument"}] * 2
+
+    errors.clear()
+    for _ in range(2):
+        shelly.publish_rpc("Shelly.GetStatus", callback=lambda result, error=None: errors.append(error), timeout=0)
+    assert len(sent) == 2
+    shelly.expire_rpcs()
+    assert errors == [RPC_TIMEOUT_ERROR] * 2
+
+
+def test_finished_read_is_sent_again(plugin, monkeypatch):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+    responses = []
+
+    shelly.publish_rpc("Switch.GetStatus", {'id': 0}, callback=lambda result, error=None: responses.append(result))
+    respond(shelly, sent[0], result={'output': True})
+    assert shelly.single_flight.calls == {}
+
+    shelly.publish_rpc("Switch.GetStatus", {'id': 0}, callback=lambda result, error=None: responses.append(result))
+    assert len(sent) == 2
+    respond(shelly, sent[1], result={'output': False})
+    assert responses == [{'output': True}, {'output': False}]
+
+
+def test_calls_with_different_params_are_not_shared(plugin, monkeypatch):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+
+    shelly.publish_rpc("Switch.GetStatus", {'id': 0}, callback=lambda result, error=None: None)
+    shelly.publish_rpc("Switch.GetStatus", {'id': 1}, callback=lambda result, error=None: None)
+    shelly.publish_rpc("Switch.Set", {'id': 0, 'on': True})
+    shelly.publish_rpc("Switch.Set", {'id': 0, 'on': True})
+    # One call waits for room in the window
+    assert len(sent) == 3
+    assert shelly.rpc.queue_depth == 1
+
+
+def test_dropped_command_is_logged(plugin, monkeypatch, caplog):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+    shelly.rpc.max_outstanding = 1
+
+    for _ in range(3):
+        shelly.publish_rpc("Switch.Set", {'id': 0, 'on': True})
+    shelly.publish_rpc("Switch.Toggle", {'id': 0})
+    shelly.publish_rpc("Switch.Toggle", {'id': 0})
+    assert len(sent) == 3
+    assert "\"Shelly\" dropped Switch.Toggle, too many RPCs are waiting to be sent" in caplog.text
+
+
+def test_rpc_ids_are_unique_session_integers():
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.extend(next_rpc_id() for _ in range(10000))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 40000
+    assert all(is_session_rpc_id(rpc_id) and rpc_id < 2 ** 53 for rpc_id in ids)
+    # Ids of another session, or the uuid4 ids of older plugin versions, are not ours
+    assert not is_session_rpc_id(((RPC_SESSION ^ 2) << 32) | 1)
+    assert not is_session_rpc_id(uuid.uuid4().hex)
+    assert not is_session_rpc_id(float(ids[0]))
+
+
+def test_rpc_ids_are_cheaper_than_uuid4():
+    ids, uuids = [], []
+    # Alternate the runs so a busy moment slows both down
+    for _ in range(7):
+        ids.append(timeit.timeit(next_rpc_id, number=20000))
+        uuids.append(timeit.timeit(lambda: uuid.uuid4().hex, number=20000))
+    assert min(ids) < min(uuids)
+
+
+def test_responses_from_another_session_are_ignored(plugin, monkeypatch):
+    shelly, sent = make_shelly(plugin, monkeypatch)
+    responses = []
+
+    shelly.publish_rpc("Shelly.GetStatus", callback=lambda result, error=None: responses.append(result))
+    for stray_id in (uuid.uuid4().hex, ((RPC_SESSION ^ 2) << 32) | (sent[0]['id'] & 0xFFFFFFFF)):
+        respond(shelly, dict(sent[0], id=stray_id), result={})
+    assert responses == []
+    assert plugin.metrics.counters["rpc stray responses"] == 2
+
+    respond(shelly, sent[0], result={'sys': {}})
+    assert responses == [{'sys': {}}]
@@ -0,0 +1,67 @@
+import json
+
+from conftest import start_shelly
+
+ADDRESS = "shellypro4pm-a8032ab12345"
+STATUS = dict(
+    {"switch:{}".format(n): {'id': n, 'output': False, 'apower': 0.0, 'voltage': 237.5, 'current': 0.0,
+                            'aenergy': {'total': 1000.0 * n}, 'temperature': {'tC': 40.1, 'tF': 104.2}} for n in range(4)},
+    **{"input:{}".format(n): {'id': n, 'state': False} for n in range(4)}
+)
+STATUS.update({
+    'sys': {'mac': "A8032AB12345", 'restart_required': False, 'uptime': 3600, 'cfg_rev': 12, 'available_updates': {}},
+    'wifi': {'sta_ip': None, 'status': "disconnected", 'ssid': None, 'rssi': 0},
+    'eth': {'ip': "10.0.0.20"},
+    'ble': {},
+    'cloud': {'connected': True},
+    'mqtt': {'connected': True},
+})
+CONFIG = dict(
+    {"switch:{}".format(n): {'id': n, 'name': "Switch {}".format(n), 'in_mode': "follow", 'initial_state': "off"} for n in range(4)},
+    **{"input:{}".format(n): {'id': n, 'name': None, 'type': "switch", 'invert': False} for n in range(4)}
+)
+CONFIG.update({
+    'sys': {'device': {'name': "Office", 'mac': "A8032AB12345", 'fw_id': "20230101-000000/1.0.0"}},
+    'wifi': {'sta': {'ssid': None, 'enable': False}},
+    'eth': {'enable': True},
+    'ble': {'enable': False},
+    'mqtt': {'enable': True, 'server': "10.0.0.2:1883"},
+})
+
+
+def start_pro_4pm(plugin, monkeypatch, device=None):
+    if device is None:
+        pro = start_shelly(plugin, 1000, ADDRESS, "shelly-pro-4-pm")
+    else:
+        plugin.deviceStartComm(device)
+        pro = plugin.shellies[device.id]
+    sent = []
+    monkeypatch.setattr(pro.rpc, "send", lambda payload: sent.append(json.loads(payload)))
+    plugin.warm_up_devices()
+    return pro, sent
+
+
+def respond(shelly, rpc, result):
+    shelly.handle_message("rpc", json.dumps({'id': rpc['id'], 'src': ADDRESS, 'dst': rpc['src'], 'result': result}))
+
+
+def test_startup_fetches_config_and_status_with_two_rpcs(indigo_plugin, monkeypatch):
+    # Warm up without a rate limit
+    indigo_plugin.warmup.rate = 0
+    pro, sent = start_pro_4pm(indigo_plugin, monkeypatch)
+    assert [rpc['method'] for rpc in sent] == ["Shelly.GetStatus"]
+
+    # The status shows a config revision that was never fetched
+    respond(pro, sent[0], STATUS)
+    assert [rpc['method'] for rpc in sent] == ["Shelly.GetStatus", "Shelly.GetConfig"]
+    respond(pro, sent[1], CONFIG)
+    assert len(sent) == 2
+    # Fetching each component separately took a GetConfig and a GetStatus per component
+    assert len(pro.components) * 2 > 20
+
+    # After a restart the stored config revision is still current
+    device = pro.device
+    indigo_plugin.deviceStopComm(device)
+    pro, sent = start_pro_4pm(indigo_plugin, monkeypatch, device)
+    respond(pro, sent[0], STATUS)
+    assert [rpc['method'] for rpc in sent] == ["Shelly.GetStatus"]
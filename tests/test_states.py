@@ -0,0 +1,70 @@
+import json
+import os
+
+from conftest import FakeDevice
+
+from shelly.components.functional.switch import Switch
+from shelly.devices.Shelly import Shelly
+from shelly.states import StateShadow
+
+TRACE = os.path.join(os.path.dirname(__file__), "traces", "shellyplus1pm_status.jsonl")
+
+
+class CountingDevice(FakeDevice):
+    def __init__(self, *args, **kwargs):
+        super(CountingDevice, self).__init__(*args, **kwargs)
+        self.states_writes = []
+
+    def updateStatesOnServer(self, states):
+        self.states_writes.append(states)
+        super(CountingDevice, self).updateStatesOnServer(states)
+
+
+def test_format_changes_are_written(metrics):
+    device = FakeDevice(1, states={'sensorValue': 21.5})
+    shadow = StateShadow(lambda: device, metrics)
+
+    # The format shown before the plugin started is unknown
+    state = {'key': "sensorValue", 'value': 21.5, 'uiValue': "21.5 °C", 'decimalPlaces': 1}
+    assert shadow.diff([state]) == [state]
+    assert shadow.diff([dict(state)]) == []
+
+    for changed in ({'uiValue': "21.5 °F"}, {'decimalPlaces': 0}):
+        state = dict(state, **changed)
+        assert shadow.diff([state]) == [state]
+
+    assert shadow.diff([{'key': "sensorValue", 'value': 21.5}]) == [{'key': "sensorValue", 'value': 21.5}]
+    assert shadow.diff([{'key': "sensorValue", 'value': 21.5}]) == []
+
+
+def test_recorded_trace_only_writes_changes(plugin):
+    plugin.devices[1] = FakeDevice(1, props={'address': "shellyplus1pm-a8032ab12345"})
+    plugin.devices[2] = CountingDevice(2, states={
+        'onOffState': False, 'curEnergyLevel': 0.0, 'voltage': 0.0, 'current': 0.0, 'power_factor': 0.0,
+        'accumEnergyTotal': 0.0, 'temperature_c': 0.0, 'temperature_f': 0.0,
+    })
+    shelly = Shelly(1)
+    shelly.functional_components.append(Switch(shelly, 2))
+    shelly.index_components()
+
+    with open(TRACE) as trace:
+        messages = trace.read().splitlines()
+    expected = {}
+    for message in messages:
+        shelly.handle_message("events", message)
+        plugin.write_buffer.flush()
+        expected.update(json.loads(message)['params']['switch:0'])
+
+    device = plugin.devices[2]
+    assert device.states['onOffState'] is False
+    assert device.states['curEnergyLevel'] == expected['apower']
+    assert device.states['voltage'] == expected['voltage']
+    assert device.states['accumEnergyTotal'] == expected['aenergy']['total']
+    assert device.states['temperature_c'] == expected['temperature']['tC']
+
+    written = plugin.metrics.counters["states written"]
+    suppressed = plugin.metrics.counters["states suppressed"]
+    assert written == sum(len(states) for states in device.states_writes)
+    # Mostly unchanged power factor, voltage and temperature are not written again
+    assert suppressed > written
+    assert len(device.states_writes) < len(messages)
@@ -0,0 +1,45 @@
+from conftest import FakeDevice
+
+from shelly.components.component import Component
+from shelly.devices.Shelly import Shelly
+
+
+class RecordingSwitch(Component):
+    component_type = "switch"
+
+    def __init__(self, shelly):
+        super(RecordingSwitch, self).__init__(shelly, comp_id=0)
+        self.processed = []
+
+    def process_status(self, status, error=None):
+        self.processed.append(dict(status))
+
+
+def make_switch(plugin):
+    plugin.status_coalesce_window = 0.25
+    plugin.devices[1] = FakeDevice(1)
+    shelly = Shelly(1)
+    switch = RecordingSwitch(shelly)
+    shelly.functional_components.append(switch)
+    shelly.index_components()
+    return shelly, switch
+
+
+def test_measurements_are_coalesced(plugin):
+    shelly, switch = make_switch(plugin)
+    shelly.queue_notify_status("switch", 0, {'apower': 5.0})
+    shelly.queue_notify_status("switch", 0, {'apower': 6.0, 'voltage': 230.0})
+    assert switch.processed == []
+
+    shelly.flush_status()
+    assert switch.processed == [{'apower': 6.0, 'voltage': 230.0}]
+
+
+def test_output_changes_are_processed_right_away_in_order(plugin):
+    shelly, switch = make_switch(plugin)
+    shelly.queue_notify_status("switch", 0, {'apower': 5.0})
+    shelly.queue_notify_status("switch", 0, {'output': True})
+    shelly.queue_notify_status("switch", 0, {'output': False})
+
+    assert switch.processed == [{'apower': 5.0}, {'output': True}, {'output': False}]
+    assert shelly.pending_status == {}
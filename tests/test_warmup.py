@@ -0,0 +1,57 @@
+import logging
+
+from shelly.warmup import WarmupScheduler
+
+
+class Device(object):
+    def __init__(self, device_id):
+        self.device_id = device_id
+
+
+def test_devices_are_released_at_the_rate(metrics):
+    scheduler = WarmupScheduler(5, metrics)
+    for device_id in range(100):
+        scheduler.schedule(Device(device_id))
+
+    # Step through 30 simulated seconds, recording when each device is released
+    released = {}
+    now = 1000.0
+    while now < 1030.0:
+        for shelly in scheduler.release_due(now):
+            released[shelly.device_id] = now
+        now += 0.01
+
+    assert sorted(released) == list(range(100))
+    assert [device_id for device_id, _ in sorted(released.items(), key=lambda item: item[1])] == list(range(100))
+    times = sorted(released.values())
+    # 5 per second with +/-50% jitter between devices
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.1 - 0.011
+    assert max(gaps) <= 0.3 + 0.011
+    assert 10.0 < times[-1] - times[0] < 30.0
+
+
+def test_no_rate_releases_everything_at_once(metrics):
+    scheduler = WarmupScheduler(0, metrics)
+    for device_id in range(100):
+        scheduler.schedule(Device(device_id))
+    assert len(scheduler.release_due(1000.0)) == 100
+    assert scheduler.time_until_next(1000.0) is None
+
+
+def test_warm_up_time_is_logged_once_every_device_is_online(metrics, caplog):
+    scheduler = WarmupScheduler(0, metrics)
+    for device_id in range(3):
+        scheduler.schedule(Device(device_id))
+    scheduler.release_due()
+
+    with caplog.at_level(logging.INFO, logger="Plugin.ShellyNGMQTT"):
+        scheduler.complete(0)
+        scheduler.complete(1, success=False)
+        assert caplog.text == ""
+        # A stopped device no longer holds back the batch
+        scheduler.cancel(2)
+
+    assert "3 device(s) online after" in caplog.text
+    assert "(1 did not respond)" in caplog.text
+    assert metrics.timings["device warm-up"].count == 1
@@ -0,0 +1,67 @@
+import threading
+
+from conftest import FakeDevice
+
+from shelly.devices.Shelly import Shelly
+from shelly.devices.ShellyBLU import ShellyBLU
+from shelly.writes import WriteBuffer
+
+
+class Device(object):
+    def __init__(self):
+        self.written = []
+        self.calls = 0
+        self.writing = threading.Event()
+        self.resume = threading.Event()
+
+    def updateStatesOnServer(self, states):
+        self.calls += 1
+        if self.calls == 1:
+            # Hold the first write until the next flush was started
+            self.writing.set()
+            self.resume.wait(5)
+        self.written.append(states)
+
+
+def test_flushes_write_in_order(metrics):
+    device = Device()
+    buffer = WriteBuffer(lambda device_id: device, metrics)
+
+    buffer.stage_states(1, [{'key': "onOffState", 'value': False}])
+    first = threading.Thread(target=buffer.flush)
+    first.start()
+    assert device.writing.wait(5)
+
+    buffer.stage_states(1, [{'key': "onOffState", 'value': True}])
+    second = threading.Thread(target=buffer.flush)
+    second.start()
+    second.join(0.2)
+    device.resume.set()
+    first.join(5)
+    second.join(5)
+
+    assert device.written == [
+        [{'key': "onOffState", 'value': False}],
+        [{'key': "onOffState", 'value': True}],
+    ]
+
+
+def test_starting_devices_stages_their_state_image(plugin):
+    plugin.devices[1] = FakeDevice(1)
+    plugin.devices[2] = FakeDevice(2, name="Shelly BLU")
+    Shelly(1)
+    ShellyBLU(2)
+    assert plugin.devices[1].image_writes == []
+    assert plugin.devices[2].image_writes == []
+
+    plugin.write_buffer.flush()
+    assert plugin.devices[1].image_writes == ["NoImage"]
+    assert plugin.devices[2].image_writes == ["NoImage"]
+
+    # Starting again after the device was stopped writes the image again
+    plugin.write_buffer.forget(1)
+    Shelly(1)
+    ShellyBLU(2)
+    plugin.write_buffer.flush()
+    assert plugin.devices[1].image_writes == ["NoImage"] * 2
+    assert plugin.devices[2].image_writes == ["NoImage"]